@@ -0,0 +1,138 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Async-friendly in-memory cache with per-entry TTL and single-flight loading.
+
+    Concurrent `get_or_load` calls for the same missing key share one loader call.
+    With `stale_ttl`, expired entries are still served for that many extra seconds
+    while a background refresh runs (stale-while-revalidate).
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024, stale_ttl: float = 0, cache_none: bool = False):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl (float): Seconds an entry is considered fresh
+            maxsize (int): Maximum number of entries, the least recently used are evicted first
+            stale_ttl (float): Extra seconds a stale entry is served while it is refreshed
+            cache_none (bool): Cache `None` results. By default missing data is looked up again next time
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self.cache_none = cache_none
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._refreshes = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key)[0] is not _MISSING
+
+    def _lookup(self, key: Hashable):
+        """Return (value, is_stale), value is _MISSING if there is no usable entry"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING, False
+        value, fresh_until = entry
+        now = time.monotonic()
+        if now >= fresh_until + self.stale_ttl:
+            del self._entries[key]
+            return _MISSING, False
+        self._entries.move_to_end(key)
+        return value, now >= fresh_until
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, even if stale, or None"""
+        value, _ = self._lookup(key)
+        return None if value is _MISSING else value
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, replacing any previous entry"""
+        if value is None and not self.cache_none:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def items(self):
+        """Iterate over (key, value) pairs of the usable entries"""
+        for key in list(self._entries):
+            value, _ = self._lookup(key)
+            if value is not _MISSING:
+                yield key, value
+
+    def invalidate(self, key: Hashable):
+        """Drop an entry, e.g. after the underlying data changed"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """
+        Get a value from the cache or load it, coalescing concurrent loads of the same key.
+
+        Args:
+            key (Hashable): Cache key
+            loader (Callable): Coroutine function returning the value to cache
+
+        Returns:
+            Optional[Any]: Cached or freshly loaded value
+        """
+        value, stale = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            if stale and key not in self._inflight:
+                task = asyncio.create_task(self._refresh(key, loader))
+                self._refreshes.add(task)
+                task.add_done_callback(self._refreshes.discard)
+            return value
+        self.misses += 1
+        return await self._load(key, loader)
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        try:
+            await self._load(key, loader)
+        except Exception as e:
+            logger.warning(f"Background refresh of {key} failed: {e}")
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
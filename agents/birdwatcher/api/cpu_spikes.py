@@ -0,0 +1,155 @@
+import os
+import warnings
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .http import get_session
+
+# Load average above which a minute is a spike, same threshold as the cpu_spikes mission
+CPU_SPIKES_LOAD_THRESHOLD = float(os.getenv("CPU_SPIKES_LOAD_THRESHOLD", 60))
+# Robust z-score against the trailing window above which a minute is a spike
+CPU_SPIKES_Z_THRESHOLD = float(os.getenv("CPU_SPIKES_Z_THRESHOLD", 6))
+# Minutes of history used as baseline
+CPU_SPIKES_WINDOW_MINUTES = int(os.getenv("CPU_SPIKES_WINDOW_MINUTES", 60))
+
+CPU_LOAD_SQL = """
+SELECT toStartOfMinute(timestamp) AS minute, max(value) AS load
+FROM organization.metrics_logs
+WHERE metric = 'LoadAverage1' AND timestamp > now() - INTERVAL {hours} HOUR
+GROUP BY minute
+ORDER BY minute
+FORMAT JSON
+"""
+
+
+async def fetch_cpu_load(tinybird_host: str, tinybird_token: str, hours: int = 24):
+    """
+    Get the maximum load average per minute of the organization through the Tinybird SQL API.
+
+    Args:
+        tinybird_host (str): Tinybird API host
+        tinybird_token (str): Token with access to the organization service datasources
+        hours (int): Hours to look back, the baseline window is added on top
+
+    Returns:
+        Tuple[List[str], np.ndarray]: Minutes and their load
+    """
+    lookback = hours + (CPU_SPIKES_WINDOW_MINUTES + 59) // 60
+    session = get_session("tinybird")
+    async with session.get(
+        f"{tinybird_host}/v0/sql",
+        params={"q": CPU_LOAD_SQL.format(hours=int(lookback))},
+        headers={"Authorization": f"Bearer {tinybird_token}"},
+    ) as response:
+        if response.status != 200:
+            raise Exception(f"Failed to query cpu load: {await response.text()}")
+        rows = (await response.json()).get("data", [])
+    return fill_minutes([row["minute"] for row in rows], np.array([row["load"] for row in rows], dtype=float))
+
+
+def fill_minutes(minutes: List[str], loads: np.ndarray):
+    """
+    Reindex a load series to one value per minute, minutes without metrics get NaN.
+
+    Windows and gaps are then counted in minutes rather than rows, so missing
+    minutes don't stretch the baseline or merge spikes far apart.
+
+    Returns:
+        Tuple[List[str], np.ndarray]: Every minute between the first and the last, and their load
+    """
+    if not minutes:
+        return [], np.array([], dtype=float)
+    times = np.array(minutes, dtype="datetime64[m]")
+    grid = np.arange(times[0], times[-1] + 1)
+    filled = np.full(len(grid), np.nan)
+    filled[(times - times[0]).astype(int)] = loads
+    return [minute.replace("T", " ") for minute in np.datetime_as_string(grid, unit="s")], filled
+
+
+def detect_spikes(
+    loads: np.ndarray,
+    window: int = CPU_SPIKES_WINDOW_MINUTES,
+    load_threshold: float = CPU_SPIKES_LOAD_THRESHOLD,
+    z_threshold: float = CPU_SPIKES_Z_THRESHOLD,
+):
+    """
+    Flag spike minutes in a load series.
+
+    A minute is a spike when its load is above `load_threshold`, or when its robust
+    z-score (median and MAD of the previous `window` minutes) is above `z_threshold`
+    and the load is at least half of `load_threshold`, so that relative jumps on an
+    idle cluster are ignored.
+
+    Minutes without metrics are NaN, they are left out of the baselines and never spikes.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Spike mask, trailing medians and robust z-scores
+    """
+    if len(loads) == 0:
+        empty = np.array([], dtype=float)
+        return np.array([], dtype=bool), empty, empty
+    # Each minute is compared with the `window` minutes before it, the first value stands in for missing history
+    history = sliding_window_view(np.pad(loads, (window, 0), mode="edge"), window)[:-1]
+    with warnings.catch_warnings():
+        # Windows without any metric have no baseline, their minutes are NaN too
+        warnings.simplefilter("ignore", RuntimeWarning)
+        medians = np.nanmedian(history, axis=1)
+        mad = np.nanmedian(np.abs(history - medians[:, None]), axis=1)
+    # Flat baselines have no spread, don't let any small change explode the score
+    scale = 1.4826 * np.maximum(mad, np.maximum(0.05 * medians, 1e-3))
+    zscores = (loads - medians) / scale
+    spikes = (loads > load_threshold) | ((zscores > z_threshold) & (loads >= load_threshold / 2))
+    return spikes, medians, zscores
+
+
+def spike_windows(minutes: List[str], loads: np.ndarray, spikes: np.ndarray, medians: np.ndarray, max_gap: int = 5) -> List[Dict]:
+    """Merge spike minutes at most `max_gap` minutes apart into windows"""
+    indexes = np.flatnonzero(spikes)
+    if len(indexes) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(indexes) > max_gap)
+    windows = []
+    for group in np.split(indexes, breaks + 1):
+        start, end = group[0], group[-1]
+        peak = start + int(np.argmax(loads[start:end + 1]))
+        windows.append({
+            "start": minutes[start],
+            "end": minutes[end],
+            "peak_minute": minutes[peak],
+            "peak_load": float(loads[peak]),
+            "baseline_load": float(medians[start]),
+            "spike_minutes": int(len(group)),
+        })
+    return windows
+
+
+async def find_cpu_spikes(tinybird_host: str, tinybird_token: str, hours: int = 24) -> List[Dict]:
+    """
+    Find the cpu spike windows of the last hours.
+
+    Returns:
+        List[Dict]: Spike windows sorted by time, empty on a quiet day
+    """
+    minutes, loads = await fetch_cpu_load(tinybird_host, tinybird_token, hours)
+    spikes, medians, _ = detect_spikes(loads)
+    # Only report spikes inside the requested period, the rest is baseline
+    since = (datetime.utcnow() - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+    spikes &= np.array([minute >= since for minute in minutes], dtype=bool)
+    return spike_windows(minutes, loads, spikes, medians)
+
+
+def describe_spikes(windows: List[Dict], limit: Optional[int] = 10) -> str:
+    """Render spike windows as instructions for the agent"""
+    top = sorted(windows, key=lambda w: w["peak_load"], reverse=True)[:limit]
+    lines = [
+        f"- {w['start']} to {w['end']} UTC: peak load {w['peak_load']:.1f} at {w['peak_minute']}, "
+        f"baseline {w['baseline_load']:.1f}, {w['spike_minutes']} minutes above normal"
+        for w in sorted(top, key=lambda w: w["start"])
+    ]
+    return (
+        "These CPU spike timeframes were already detected in organization.metrics_logs (LoadAverage1, max per minute). "
+        "Skip finding the spikes and investigate these timeframes:\n" + "\n".join(lines)
+    )
@@ -0,0 +1,137 @@
+import os
+from datetime import datetime, timedelta
+from typing import Set
+
+# Schedule of the notifications of channels that don't set their own
+DEFAULT_NOTIFICATION_SCHEDULE = os.getenv("NOTIFICATION_SCHEDULE", "0 9 * * *")
+
+# Shortcuts accepted instead of the five fields
+CRON_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+MONTH_NAMES = {name: i for i, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+DAY_NAMES = {name: i for i, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+
+
+def _parse_value(value: str, names: dict) -> int:
+    value = value.lower()
+    if value in names:
+        return names[value]
+    if not value.isdigit():
+        raise ValueError(f"invalid value '{value}'")
+    return int(value)
+
+
+def _parse_field(field: str, low: int, high: int, names: dict = None) -> Set[int]:
+    """Parse one cron field (lists, ranges, steps and names) into the set of values it matches"""
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise ValueError(f"invalid step '{step_text}'")
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = _parse_value(start_text, names or {}), _parse_value(end_text, names or {})
+        else:
+            start = _parse_value(part, names or {})
+            # a/n means from a to the end of the range
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"'{field}' out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    A standard five field cron expression: minute, hour, day of month, month and day of week.
+
+    Supports lists, ranges, steps, month and day names and the @daily style macros. As in
+    cron, when both day of month and day of week are restricted a day matching either runs.
+    Times are naive datetimes, the scheduler uses UTC.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = CRON_MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression '{expression}': expected 5 fields")
+        try:
+            self.minutes = _parse_field(fields[0], 0, 59)
+            self.hours = _parse_field(fields[1], 0, 23)
+            self.days = _parse_field(fields[2], 1, 31)
+            self.months = _parse_field(fields[3], 1, 12, MONTH_NAMES)
+            weekdays = _parse_field(fields[4], 0, 7, DAY_NAMES)
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression '{expression}': {e}") from None
+        # 0 and 7 are both Sunday
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def __repr__(self):
+        return f"CronSchedule('{self.expression}')"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_match = moment.day in self.days
+        # Python weekdays start on Monday, cron ones on Sunday
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_match
+        if self._any_weekday:
+            return day_match
+        return day_match or weekday_match
+
+    def matches(self, moment: datetime) -> bool:
+        return (
+            moment.minute in self.minutes
+            and moment.hour in self.hours
+            and moment.month in self.months
+            and self._day_matches(moment)
+        )
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        Get the first time after `moment` the schedule runs.
+
+        Args:
+            moment (datetime): Time to start from, excluded
+
+        Returns:
+            datetime: Next run, at the start of a minute
+
+        Raises:
+            ValueError: If the schedule never runs, e.g. on February 30th
+        """
+        current = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Leap days repeat every 4 years, anything not found by then never runs
+        limit = current + timedelta(days=366 * 5)
+        while current < limit:
+            if current.month not in self.months:
+                current = (current.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(current):
+                current = current.replace(hour=0, minute=0) + timedelta(days=1)
+            elif current.hour not in self.hours:
+                current = current.replace(minute=0) + timedelta(hours=1)
+            elif current.minute not in self.minutes:
+                later = [minute for minute in self.minutes if minute > current.minute]
+                if later:
+                    current = current.replace(minute=min(later))
+                else:
+                    current = current.replace(minute=0) + timedelta(hours=1)
+            else:
+                return current
+        raise ValueError(f"Cron expression '{self.expression}' never runs")
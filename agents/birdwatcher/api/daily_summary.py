@@ -0,0 +1,249 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .http import get_session
+from .workspaces import token_fingerprint
+from .tinybird import TinybirdConfig
+
+# Relative change against the baseline from which a metric is reported
+DAILY_SUMMARY_CHANGE_THRESHOLD = float(os.getenv("DAILY_SUMMARY_CHANGE_THRESHOLD", 0.5))
+# Previous days averaged into the baseline
+DAILY_SUMMARY_BASELINE_DAYS = int(os.getenv("DAILY_SUMMARY_BASELINE_DAYS", 7))
+# Maximum metrics handed to the agent
+DAILY_SUMMARY_MAX_ROWS = int(os.getenv("DAILY_SUMMARY_MAX_ROWS", 60))
+
+WORKSPACES_JOIN = "LEFT JOIN (SELECT workspace_id, name AS workspace_name FROM organization.workspaces) USING workspace_id"
+
+# Aggregates of the last 24 hours per resource, each column but the keys is a metric
+DAILY_AGGREGATES_SQL = {
+    "pipe": f"""
+        SELECT workspace_id, workspace_name, pipe_name AS resource_name,
+            count() AS requests,
+            countIf(status_code >= 400) AS errors,
+            avg(duration) AS avg_duration,
+            quantile(0.95)(duration) AS p95_duration,
+            sum(read_bytes) AS read_bytes
+        FROM organization.pipe_stats_rt
+        {WORKSPACES_JOIN}
+        WHERE start_datetime > now() - INTERVAL 1 DAY
+        GROUP BY workspace_id, workspace_name, resource_name
+        ORDER BY requests DESC
+        LIMIT 1000
+        FORMAT JSON
+    """,
+    "datasource": f"""
+        SELECT workspace_id, workspace_name, datasource_name AS resource_name,
+            count() AS operations,
+            countIf(result = 'error') AS errors,
+            sum(rows) AS rows,
+            sum(written_bytes) AS written_bytes,
+            sum(elapsed_time) AS elapsed_time
+        FROM organization.datasources_ops_log
+        {WORKSPACES_JOIN}
+        WHERE timestamp > now() - INTERVAL 1 DAY
+        GROUP BY workspace_id, workspace_name, resource_name
+        ORDER BY operations DESC
+        LIMIT 1000
+        FORMAT JSON
+    """,
+    "job": f"""
+        SELECT workspace_id, workspace_name, job_type AS resource_name,
+            count() AS jobs,
+            countIf(status = 'error') AS errors,
+            avg(dateDiff('second', started_at, updated_at)) AS avg_duration
+        FROM organization.jobs_log
+        {WORKSPACES_JOIN}
+        WHERE created_at > now() - INTERVAL 1 DAY
+        GROUP BY workspace_id, workspace_name, resource_name
+        ORDER BY jobs DESC
+        LIMIT 1000
+        FORMAT JSON
+    """,
+}
+
+KEY_COLUMNS = ("workspace_id", "workspace_name", "resource_name")
+
+# Smallest absolute change reported per metric, durations are in seconds. Counts and bytes use DEFAULT_MIN_CHANGE
+MIN_CHANGE = {"avg_duration": 0.01, "p95_duration": 0.01, "elapsed_time": 0.01}
+DEFAULT_MIN_CHANGE = 1
+
+
+async def _query(tinybird_host: str, tinybird_token: str, sql: str) -> List[Dict]:
+    session = get_session("tinybird")
+    async with session.get(
+        f"{tinybird_host}/v0/sql",
+        params={"q": sql},
+        headers={"Authorization": f"Bearer {tinybird_token}"},
+    ) as response:
+        if response.status != 200:
+            raise Exception(f"Failed to query daily aggregates: {await response.text()}")
+        return (await response.json()).get("data", [])
+
+
+async def fetch_daily_aggregates(tinybird_host: str, tinybird_token: str) -> List[Dict]:
+    """
+    Get the metrics of the last 24 hours per workspace resource through the Tinybird SQL API.
+
+    Returns:
+        List[Dict]: One row per resource metric with workspace_id, workspace_name, resource_type,
+            resource_name, metric and value
+    """
+    results = await asyncio.gather(*(
+        _query(tinybird_host, tinybird_token, sql) for sql in DAILY_AGGREGATES_SQL.values()
+    ))
+    aggregates = []
+    for resource_type, rows in zip(DAILY_AGGREGATES_SQL, results):
+        for row in rows:
+            for metric, value in row.items():
+                if metric in KEY_COLUMNS or value is None:
+                    continue
+                aggregates.append({
+                    "workspace_id": row.get("workspace_id") or "",
+                    "workspace_name": row.get("workspace_name") or "",
+                    "resource_type": resource_type,
+                    "resource_name": row.get("resource_name") or "",
+                    "metric": metric,
+                    "value": float(value),
+                })
+    return aggregates
+
+
+def compare_with_baselines(
+    aggregates: List[Dict],
+    baselines: List[Dict],
+    threshold: float = DAILY_SUMMARY_CHANGE_THRESHOLD,
+) -> List[Dict]:
+    """
+    Pick the metrics that changed notably against their baseline.
+
+    A metric is notable when it changed by more than `threshold` relative to its baseline
+    and by at least its MIN_CHANGE, or when a resource without baseline has errors.
+
+    Returns:
+        List[Dict]: Aggregates with their baseline and change, largest changes first
+    """
+    by_key = {
+        (b["resource_type"], b["workspace_id"], b["resource_name"], b["metric"]): b
+        for b in baselines
+    }
+    changes = []
+    for aggregate in aggregates:
+        key = (aggregate["resource_type"], aggregate["workspace_id"], aggregate["resource_name"], aggregate["metric"])
+        baseline = by_key.get(key)
+        value = aggregate["value"]
+        if baseline is None:
+            # New resource or metric, only worth reporting if it's failing
+            if aggregate["metric"] == "errors" and value > 0:
+                changes.append({**aggregate, "baseline": None, "change": None})
+            continue
+        base = float(baseline["baseline"])
+        if base == 0:
+            change = None if value == 0 else float("inf")
+        else:
+            change = (value - base) / base
+        min_change = MIN_CHANGE.get(aggregate["metric"], DEFAULT_MIN_CHANGE)
+        if change is not None and abs(change) >= threshold and abs(value - base) >= min_change:
+            changes.append({**aggregate, "baseline": base, "change": change})
+    changes.sort(key=lambda c: (c["change"] is None, -abs(c["change"] or 0), -c["value"]))
+    return changes
+
+
+def _format_value(value: float) -> str:
+    if value >= 1e9:
+        return f"{value / 1e9:.1f}G"
+    if value >= 1e6:
+        return f"{value / 1e6:.1f}M"
+    if value >= 1e3:
+        return f"{value / 1e3:.1f}k"
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def describe_daily_summary(changes: List[Dict], aggregates: List[Dict], has_baseline: bool, limit: int = DAILY_SUMMARY_MAX_ROWS) -> str:
+    """Render the notable changes as instructions for the agent"""
+    workspaces = sorted({a["workspace_name"] or a["workspace_id"] for a in aggregates})
+    header = (
+        "The metrics of the last 24 hours were already extracted from organization.pipe_stats_rt, "
+        "organization.datasources_ops_log and organization.jobs_log "
+        f"for {len(workspaces)} workspaces: {', '.join(workspaces[:20])}. "
+        "Do not query them again, only query to drill into a change if needed.\n"
+    )
+    if not has_baseline:
+        header += "There is no baseline yet, these are the busiest resources and all resources with errors:\n"
+    else:
+        header += f"Metrics that changed notably against the average of the previous {DAILY_SUMMARY_BASELINE_DAYS} days:\n"
+    if not changes:
+        return header + "No notable changes."
+    lines = ["workspace | type | resource | metric | last 24h | baseline | change"]
+    for c in changes[:limit]:
+        if c["baseline"] is None:
+            baseline, change = "-", "new"
+        else:
+            baseline = _format_value(c["baseline"])
+            change = "new" if c["change"] == float("inf") else f"{c['change']:+.0%}"
+        lines.append(
+            f"{c['workspace_name'] or c['workspace_id']} | {c['resource_type']} | {c['resource_name']} | "
+            f"{c['metric']} | {_format_value(c['value'])} | {baseline} | {change}"
+        )
+    if len(changes) > limit:
+        lines.append(f"... and {len(changes) - limit} more")
+    return header + "\n".join(lines)
+
+
+async def build_daily_summary_context(
+    baseline_store: TinybirdConfig,
+    tinybird_host: str,
+    tinybird_token: str,
+    day: Optional[str] = None,
+) -> Tuple[str, List[Dict]]:
+    """
+    Aggregate the newest day of a workspace, store it as a baseline and diff it against the previous days.
+
+    Args:
+        baseline_store (TinybirdConfig): Where the daily aggregates are kept
+        tinybird_host (str): Tinybird host of the monitored workspace
+        tinybird_token (str): Token of the monitored workspace
+        day (str, optional): Day being summarized as YYYY-MM-DD. Defaults to today (UTC)
+
+    Returns:
+        Tuple[str, List[Dict]]: Instructions for the agent and the notable changes they list
+    """
+    day = day or datetime.utcnow().strftime("%Y-%m-%d")
+    fingerprint = token_fingerprint(tinybird_token)
+    aggregates, baselines = await asyncio.gather(
+        fetch_daily_aggregates(tinybird_host, tinybird_token),
+        baseline_store.get_daily_baselines(tinybird_host, fingerprint, day, DAILY_SUMMARY_BASELINE_DAYS),
+    )
+    if not await baseline_store.save_daily_aggregates(tinybird_host, fingerprint, day, aggregates):
+        print(f"Failed to save the daily aggregates of {tinybird_host}, the next summary will lack this day")
+
+    if baselines:
+        changes = compare_with_baselines(aggregates, baselines)
+    else:
+        # First summary: report the busiest resources and any errors
+        errors = [a for a in aggregates if a["metric"] == "errors" and a["value"] > 0]
+        busiest = sorted(
+            (a for a in aggregates if a["metric"] in ("requests", "operations", "jobs")),
+            key=lambda a: a["value"],
+            reverse=True,
+        )
+        changes = [{**a, "baseline": None, "change": None} for a in errors + busiest]
+    return describe_daily_summary(changes, aggregates, has_baseline=bool(baselines)), changes
+
+
+# Checks of the baseline comparison, run with `python -m api.daily_summary`
+if __name__ == "__main__":
+    def aggregate(metric, value):
+        return {"resource_type": "pipe", "workspace_id": "w", "workspace_name": "w", "resource_name": "p", "metric": metric, "value": value}
+
+    def baseline(metric, value):
+        return {"resource_type": "pipe", "workspace_id": "w", "workspace_name": "w", "resource_name": "p", "metric": metric, "baseline": value}
+
+    changes = compare_with_baselines([aggregate("p95_duration", 0.9)], [baseline("p95_duration", 0.1)])
+    assert [c["metric"] for c in changes] == ["p95_duration"], "A 0.1s to 0.9s p95 change must be reported"
+    changes = compare_with_baselines([aggregate("p95_duration", 0.012)], [baseline("p95_duration", 0.004)])
+    assert not changes, "Sub 10ms latency changes are noise"
+    changes = compare_with_baselines([aggregate("requests", 1.6)], [baseline("requests", 1)])
+    assert not changes, "Counts must change by at least one"
+    print("daily summary checks passed")
@@ -0,0 +1,156 @@
+import os
+import time
+import logging
+import tempfile
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 300
+
+# File used by the legacy file backend to store processed message IDs
+PROCESSED_MESSAGES_FILE = os.path.join(tempfile.gettempdir(), "slack_bot_processed_messages.txt")
+
+
+class DedupBackend(ABC):
+    """
+    Interface for the stores used to deduplicate Slack events.
+
+    Backends remember a key for `ttl` seconds. Implement `seen` and `mark` to plug
+    in a shared store (e.g. Redis) when running more than one machine.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def seen(self, key: str) -> bool:
+        """Return True if the key was marked less than `ttl` seconds ago"""
+
+    @abstractmethod
+    async def mark(self, key: str):
+        """Remember the key for `ttl` seconds"""
+
+    async def check_and_mark(self, key: str) -> bool:
+        """
+        Mark a key as processed.
+
+        Args:
+            key (str): Unique ID of the event
+
+        Returns:
+            bool: True if the key had already been processed
+        """
+        if await self.seen(key):
+            return True
+        await self.mark(key)
+        return False
+
+
+class MemoryDedupBackend(DedupBackend):
+    """In-memory TTL set. Keys are kept in insertion order, which is also expiry order"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS):
+        super().__init__(ttl)
+        self._expires_at: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._expires_at)
+
+    def _expire(self, now: float):
+        while self._expires_at:
+            key, expires_at = next(iter(self._expires_at.items()))
+            if expires_at > now:
+                break
+            self._expires_at.popitem(last=False)
+
+    async def seen(self, key: str) -> bool:
+        self._expire(time.monotonic())
+        return key in self._expires_at
+
+    async def mark(self, key: str):
+        now = time.monotonic()
+        self._expire(now)
+        self._expires_at[key] = now + self.ttl
+        self._expires_at.move_to_end(key)
+
+
+class FileDedupBackend(DedupBackend):
+    """Legacy backend storing `message_id|timestamp` lines in a temp file"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, path: str = PROCESSED_MESSAGES_FILE):
+        super().__init__(ttl)
+        self.path = path
+
+    async def seen(self, key: str) -> bool:
+        try:
+            if not os.path.exists(self.path):
+                return False
+
+            cutoff_time = time.time() - self.ttl
+
+            with open(self.path, 'r') as f:
+                lines = f.readlines()
+
+            # Check if the key exists and clean up old entries
+            processed_ids = []
+            message_exists = False
+
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+
+                parts = line.split('|')
+                if len(parts) == 2:
+                    stored_id, timestamp_str = parts
+                    try:
+                        timestamp = float(timestamp_str)
+                        if timestamp > cutoff_time:  # Keep recent entries
+                            processed_ids.append(line)
+                            if stored_id == key:
+                                message_exists = True
+                    except ValueError:
+                        continue
+
+            # Write back cleaned up entries
+            with open(self.path, 'w') as f:
+                f.write('\n'.join(processed_ids) + '\n')
+
+            return message_exists
+        except Exception as e:
+            logger.error(f"Error checking processed messages: {e}")
+            return False
+
+    async def mark(self, key: str):
+        try:
+            with open(self.path, 'a') as f:
+                f.write(f"{key}|{time.time()}\n")
+        except Exception as e:
+            logger.error(f"Error marking message as processed: {e}")
+
+
+DEDUP_BACKENDS: Dict[str, Type[DedupBackend]] = {
+    "memory": MemoryDedupBackend,
+    "file": FileDedupBackend,
+}
+
+
+def create_dedup_backend(name: Optional[str] = None, ttl: Optional[float] = None) -> DedupBackend:
+    """
+    Create the dedup backend selected by name or the DEDUP_BACKEND environment variable.
+
+    Args:
+        name (str, optional): Backend name, one of DEDUP_BACKENDS. Defaults to "memory"
+        ttl (float, optional): Seconds to remember a key. Defaults to DEDUP_TTL_SECONDS or 300
+
+    Returns:
+        DedupBackend: Dedup backend instance
+    """
+    name = name or os.getenv("DEDUP_BACKEND", "memory")
+    ttl = ttl or float(os.getenv("DEDUP_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+    if name not in DEDUP_BACKENDS:
+        raise ValueError(f"Unknown dedup backend: {name}. Choose from: {', '.join(DEDUP_BACKENDS)}")
+    return DEDUP_BACKENDS[name](ttl=ttl)
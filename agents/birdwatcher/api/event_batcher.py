@@ -0,0 +1,231 @@
+import os
+import gzip
+import json
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from .http import get_session
+
+logger = logging.getLogger(__name__)
+
+# A datasource is flushed when it has this many rows or bytes buffered, or every TINYBIRD_EVENTS_FLUSH_SECONDS
+TINYBIRD_EVENTS_FLUSH_ROWS = int(os.getenv("TINYBIRD_EVENTS_FLUSH_ROWS", 500))
+TINYBIRD_EVENTS_FLUSH_BYTES = int(os.getenv("TINYBIRD_EVENTS_FLUSH_BYTES", 1_000_000))
+TINYBIRD_EVENTS_FLUSH_SECONDS = float(os.getenv("TINYBIRD_EVENTS_FLUSH_SECONDS", 2))
+# Rows kept in memory across datasources while Tinybird can't take them, the oldest are dropped first
+TINYBIRD_EVENTS_MAX_BUFFERED_ROWS = int(os.getenv("TINYBIRD_EVENTS_MAX_BUFFERED_ROWS", 10_000))
+TINYBIRD_EVENTS_MAX_RETRIES = int(os.getenv("TINYBIRD_EVENTS_MAX_RETRIES", 4))
+# Smaller bodies are sent as is, compressing them costs more than it saves
+GZIP_MIN_BYTES = 1024
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 30
+
+
+class EventBatcher:
+    """
+    Buffers NDJSON rows per datasource and sends them to the Tinybird Events API in batches.
+
+    Batches are gzip compressed and retried with exponential backoff on 429, 5xx and
+    connection errors. Rows of failed batches go back to the buffer, which is bounded by
+    `max_buffered_rows`. `send` is the synchronous path: it sends the buffered rows of the
+    datasource plus the given ones right away and waits for Tinybird to ingest them, for
+    writes that are read back immediately. Call `close` on shutdown to flush everything.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        token: str,
+        flush_rows: Optional[int] = None,
+        flush_bytes: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_buffered_rows: Optional[int] = None,
+        max_retries: Optional[int] = None,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            host (str): Tinybird host URL
+            token (str): Tinybird token with append rights on the datasources
+            flush_rows (int, optional): Rows that trigger a flush. Defaults to TINYBIRD_EVENTS_FLUSH_ROWS or 500
+            flush_bytes (int, optional): Uncompressed bytes that trigger a flush. Defaults to TINYBIRD_EVENTS_FLUSH_BYTES or 1MB
+            flush_interval (float, optional): Seconds between flushes. Defaults to TINYBIRD_EVENTS_FLUSH_SECONDS or 2
+            max_buffered_rows (int, optional): Rows kept in memory. Defaults to TINYBIRD_EVENTS_MAX_BUFFERED_ROWS or 10000
+            max_retries (int, optional): Retries of a failed batch. Defaults to TINYBIRD_EVENTS_MAX_RETRIES or 4
+        """
+        self.host = host.rstrip("/")
+        self.token = token
+        self.flush_rows = flush_rows or TINYBIRD_EVENTS_FLUSH_ROWS
+        self.flush_bytes = flush_bytes or TINYBIRD_EVENTS_FLUSH_BYTES
+        self.flush_interval = flush_interval or TINYBIRD_EVENTS_FLUSH_SECONDS
+        self.max_buffered_rows = max_buffered_rows or TINYBIRD_EVENTS_MAX_BUFFERED_ROWS
+        self.max_retries = max_retries if max_retries is not None else TINYBIRD_EVENTS_MAX_RETRIES
+        self._buffers: Dict[str, Deque[str]] = {}
+        self._bytes: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._flushes = set()
+        self.metrics = {"rows": 0, "sent": 0, "requests": 0, "retries": 0, "rejected": 0, "dropped": 0}
+
+    @property
+    def buffered(self) -> int:
+        return sum(len(lines) for lines in self._buffers.values())
+
+    def add(self, table_name: str, events: List[Dict]):
+        """Buffer rows of a datasource, they are sent by the next flush"""
+        lines = [json.dumps(event, default=str) + "\n" for event in events]
+        self._append(table_name, lines)
+        self.metrics["rows"] += len(lines)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Flushed by `close`
+            return
+        if len(self._buffers[table_name]) >= self.flush_rows or self._bytes[table_name] >= self.flush_bytes:
+            task = asyncio.create_task(self.flush(table_name))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        elif self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    def _append(self, table_name: str, lines: List[str], front: bool = False):
+        buffer = self._buffers.setdefault(table_name, deque())
+        if front:
+            buffer.extendleft(reversed(lines))
+        else:
+            buffer.extend(lines)
+        self._bytes[table_name] = self._bytes.get(table_name, 0) + sum(len(line) for line in lines)
+        overflow = self.buffered - self.max_buffered_rows
+        if overflow > 0:
+            self._drop_oldest(overflow)
+
+    def _drop_oldest(self, count: int):
+        # From the datasources with the most rows, so a flood on one doesn't evict the rest
+        self.metrics["dropped"] += count
+        logger.warning(f"Tinybird events buffer full, dropping the {count} oldest rows")
+        while count > 0:
+            table_name, buffer = max(self._buffers.items(), key=lambda item: len(item[1]))
+            line = buffer.popleft()
+            self._bytes[table_name] -= len(line)
+            count -= 1
+
+    def _take(self, table_name: str) -> List[str]:
+        lines = list(self._buffers.get(table_name) or [])
+        self._buffers[table_name] = deque()
+        self._bytes[table_name] = 0
+        return lines
+
+    async def _flush_periodically(self):
+        while self.buffered:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self, table_name: Optional[str] = None) -> bool:
+        """
+        Send the buffered rows of a datasource, or of all of them.
+
+        Returns:
+            bool: True if every batch was accepted, rows of failed batches are buffered again
+        """
+        names = [table_name] if table_name else [name for name, lines in self._buffers.items() if lines]
+        results = await asyncio.gather(*[self._flush_table(name) for name in names])
+        return all(results)
+
+    async def _flush_table(self, table_name: str, extra: Optional[List[str]] = None, wait: bool = False) -> bool:
+        lock = self._locks.setdefault(table_name, asyncio.Lock())
+        async with lock:
+            # Taken under the lock so batches of a datasource are sent in order
+            buffered = self._take(table_name)
+            lines = buffered + (extra or [])
+            if not lines:
+                return True
+            sent, retry = False, True
+            try:
+                sent, retry = await self._send(table_name, lines, wait)
+            finally:
+                # Rows sent synchronously are reported to the caller instead of kept
+                if not sent and retry:
+                    self._append(table_name, buffered, front=True)
+            return sent
+
+    async def send(self, table_name: str, events: List[Dict]) -> bool:
+        """Send rows right away, after the buffered rows of the datasource, and wait until they are ingested"""
+        lines = [json.dumps(event, default=str) + "\n" for event in events]
+        self.metrics["rows"] += len(lines)
+        return await self._flush_table(table_name, lines, wait=True)
+
+    async def _send(self, table_name: str, lines: List[str], wait: bool) -> Tuple[bool, bool]:
+        """POST a batch with retries, returns whether it was sent and whether it's worth retrying later"""
+        body = "".join(lines).encode()
+        headers = {"Authorization": f"Bearer {self.token}", "Content-Type": "application/x-ndjson"}
+        if len(body) >= GZIP_MIN_BYTES:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        params = {"name": table_name}
+        if wait:
+            params["wait"] = "true"
+
+        session = get_session("tinybird")
+        for attempt in range(self.max_retries + 1):
+            delay = None
+            try:
+                self.metrics["requests"] += 1
+                async with session.post(f"{self.host}/v0/events", params=params, headers=headers, data=body) as response:
+                    if response.status in (200, 202):
+                        self.metrics["sent"] += len(lines)
+                        logger.info(f"Saved {len(lines)} events to {table_name}")
+                        return True, False
+                    error_text = await response.text()
+                    if response.status != 429 and response.status < 500:
+                        # Won't succeed on a retry, e.g. a wrong token or datasource
+                        self.metrics["rejected"] += len(lines)
+                        logger.error(f"Tinybird rejected {len(lines)} events for {table_name}. Status: {response.status}, Error: {error_text}")
+                        return False, False
+                    retry_after = response.headers.get("Retry-After")
+                    if retry_after and retry_after.replace(".", "", 1).isdigit():
+                        delay = float(retry_after)
+                    logger.warning(f"Failed to save events to {table_name}. Status: {response.status}, Error: {error_text}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Error saving events to {table_name}: {e}")
+            if attempt < self.max_retries:
+                self.metrics["retries"] += 1
+                if delay is None:
+                    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+                await asyncio.sleep(min(delay, RETRY_MAX_SECONDS))
+        return False, True
+
+    async def close(self):
+        """Stop the periodic flush and send everything buffered"""
+        pending = list(self._flushes)
+        if self._flusher and not self._flusher.done():
+            # An interrupted flush puts its rows back in the buffer
+            self._flusher.cancel()
+            pending.append(self._flusher)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self.flush()
+        if self.buffered:
+            logger.error(f"Could not save {self.buffered} buffered Tinybird events on shutdown")
+
+
+# Shared batchers keyed by host and token, so every TinybirdConfig of a workspace batches together
+_batchers: Dict[Tuple[str, str], EventBatcher] = {}
+
+
+def get_event_batcher(host: str, token: str) -> EventBatcher:
+    key = (host.rstrip("/"), token)
+    batcher = _batchers.get(key)
+    if batcher is None:
+        batcher = _batchers[key] = EventBatcher(host, token)
+    return batcher
+
+
+async def close_event_batchers(app=None):
+    """Flush every batcher, usable as an aiohttp on_cleanup hook. Must run before the HTTP sessions are closed"""
+    await asyncio.gather(*[batcher.close() for batcher in _batchers.values()], return_exceptions=True)
@@ -0,0 +1,82 @@
+import json
+import math
+import hashlib
+from datetime import datetime
+from typing import Dict, List
+
+from .cpu_spikes import CPU_SPIKES_LOAD_THRESHOLD
+
+# Spike windows are bucketed so a spike still growing keeps its fingerprint
+SPIKE_WINDOW_BUCKET_MINUTES = 15
+
+
+def _bucket_minute(minute: str) -> str:
+    moment = datetime.fromisoformat(minute.replace("T", " ").rstrip("Z"))
+    bucket = moment.minute - moment.minute % SPIKE_WINDOW_BUCKET_MINUTES
+    return moment.replace(minute=bucket, second=0).strftime("%Y-%m-%d %H:%M")
+
+
+def cpu_spike_findings(windows: List[Dict]) -> List[Dict]:
+    """
+    Turn cpu spike windows into findings.
+
+    Severity is critical when the peak doubles the load threshold, high when it's above
+    it and elevated for spikes only detected against the baseline.
+    """
+    findings = []
+    for window in windows:
+        peak = window["peak_load"]
+        if peak >= 2 * CPU_SPIKES_LOAD_THRESHOLD:
+            severity = "critical"
+        elif peak > CPU_SPIKES_LOAD_THRESHOLD:
+            severity = "high"
+        else:
+            severity = "elevated"
+        findings.append({
+            "resource": "cluster",
+            "metric": "LoadAverage1",
+            "window": _bucket_minute(window["start"]),
+            "severity": severity,
+        })
+    return findings
+
+
+def _change_severity(change: Dict) -> str:
+    baseline, value = change.get("baseline"), change["value"]
+    if not baseline:
+        return "new"
+    if value <= 0:
+        return "gone"
+    # Changes of the same order of magnitude (powers of two) are the same finding
+    ratio = value / baseline
+    level = max(1, round(abs(math.log2(ratio))))
+    return f"{'+' if ratio > 1 else '-'}{2 ** level}x"
+
+
+def daily_summary_findings(changes: List[Dict]) -> List[Dict]:
+    """Turn the notable changes of a daily summary into findings, severity is the order of magnitude of the change"""
+    return [
+        {
+            "resource": f"{c['workspace_name'] or c['workspace_id']}/{c['resource_type']}/{c['resource_name']}",
+            "metric": c["metric"],
+            "window": "24h",
+            "severity": _change_severity(c),
+        }
+        for c in changes
+    ]
+
+
+def fingerprint_findings(notification_type: str, findings: List[Dict]) -> str:
+    """
+    Fingerprint a set of findings, regardless of their order.
+
+    Args:
+        notification_type (str): Notification type the findings belong to
+        findings (List[Dict]): Findings with resource, metric, window and severity
+
+    Returns:
+        str: Hex digest, equal for reports without material changes
+    """
+    canonical = sorted(json.dumps(finding, sort_keys=True) for finding in findings)
+    payload = json.dumps([notification_type, canonical])
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
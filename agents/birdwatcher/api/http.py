@@ -0,0 +1,124 @@
+import os
+import time
+import logging
+from typing import Dict
+
+import aiohttp
+import httpx
+
+from .metrics import http_request_duration
+
+logger = logging.getLogger(__name__)
+
+# Shared, long-lived client sessions keyed by the service they talk to
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+
+
+def _request_metrics(service: str) -> aiohttp.TraceConfig:
+    """Observe the duration and status of every request of a session"""
+
+    async def on_request_start(session, context, params):
+        context.start = time.monotonic()
+
+    async def on_request_end(session, context, params):
+        http_request_duration.observe(
+            time.monotonic() - context.start, service=service, method=params.method, status=params.response.status
+        )
+
+    async def on_request_exception(session, context, params):
+        http_request_duration.observe(time.monotonic() - context.start, service=service, method=params.method, status="error")
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+class _MetricsTransport(httpx.AsyncBaseTransport):
+    """Observe the duration and status of every request of an httpx client, like `_request_metrics`"""
+
+    def __init__(self, service: str, transport: httpx.AsyncBaseTransport):
+        self.service = service
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.monotonic()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            http_request_duration.observe(time.monotonic() - start, service=self.service, method=request.method, status="error")
+            raise
+        http_request_duration.observe(
+            time.monotonic() - start, service=self.service, method=request.method, status=response.status_code
+        )
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def create_mcp_http_client(headers=None, timeout: httpx.Timeout = None, auth: httpx.Auth = None) -> httpx.AsyncClient:
+    """
+    httpx client factory of the MCP streamable HTTP transport, with the defaults of the MCP SDK.
+
+    Requests are reported under the mcp service of the HTTP request metrics.
+    """
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=timeout or httpx.Timeout(30.0),
+        headers=headers,
+        auth=auth,
+        transport=_MetricsTransport("mcp", httpx.AsyncHTTPTransport()),
+    )
+
+
+def _create_session(name: str) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=int(os.getenv("HTTP_POOL_SIZE", 100)),
+        limit_per_host=int(os.getenv("HTTP_POOL_SIZE_PER_HOST", 20)),
+        keepalive_timeout=float(os.getenv("HTTP_KEEPALIVE_SECONDS", 30)),
+        ttl_dns_cache=int(os.getenv("HTTP_DNS_CACHE_SECONDS", 300)),
+    )
+    timeout = aiohttp.ClientTimeout(total=float(os.getenv("HTTP_TIMEOUT_SECONDS", 60)))
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[_request_metrics(name)])
+
+
+def get_session(name: str = "default") -> aiohttp.ClientSession:
+    """
+    Get the shared client session for a service, creating it on first use.
+
+    Sessions must not be closed by callers, use `close_sessions` on shutdown.
+
+    Args:
+        name (str): Service name, e.g. 'slack' or 'tinybird'
+
+    Returns:
+        aiohttp.ClientSession: Long-lived session with pooled keep-alive connections
+    """
+    session = _sessions.get(name)
+    if session is None or session.closed:
+        session = _create_session(name)
+        _sessions[name] = session
+    return session
+
+
+async def close_sessions():
+    """Close every shared client session"""
+    for name, session in list(_sessions.items()):
+        if not session.closed:
+            await session.close()
+        _sessions.pop(name, None)
+
+
+async def init_http_sessions(app):
+    """aiohttp on_startup hook: open the Slack and Tinybird sessions"""
+    get_session("slack")
+    get_session("tinybird")
+    logger.info("Opened shared HTTP sessions")
+
+
+async def close_http_sessions(app):
+    """aiohttp on_cleanup hook: close the shared sessions"""
+    await close_sessions()
+    logger.info("Closed shared HTTP sessions")
@@ -0,0 +1,99 @@
+import os
+import asyncio
+import logging
+import traceback
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 100
+
+
+class JobQueue:
+    """In-process async job queue served by a fixed pool of worker tasks"""
+
+    def __init__(self, workers: Optional[int] = None, maxsize: Optional[int] = None):
+        """
+        Initialize the job queue.
+
+        Args:
+            workers (int, optional): Number of concurrent workers. Defaults to SLACK_WORKERS or 4
+            maxsize (int, optional): Maximum number of pending jobs. Defaults to SLACK_QUEUE_SIZE or 100
+        """
+        self.workers = workers or int(os.getenv("SLACK_WORKERS", DEFAULT_WORKERS))
+        self.maxsize = maxsize or int(os.getenv("SLACK_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+        self.in_flight = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self):
+        """Spawn the worker tasks on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Started job queue with {self.workers} workers (max {self.maxsize} pending jobs)")
+
+    async def stop(self, timeout: float = 30):
+        """
+        Wait for pending jobs to finish and cancel the workers.
+
+        Args:
+            timeout (float): Seconds to wait for the queue to drain before cancelling
+        """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Job queue did not drain in {timeout}s, cancelling {self.qsize()} pending jobs")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, func: Callable[..., Awaitable], *args, **kwargs) -> bool:
+        """
+        Schedule a coroutine function to run on a worker.
+
+        Args:
+            func (Callable): Coroutine function to run
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            bool: True if the job was queued, False if the queue is full or not started
+        """
+        if not self.running:
+            logger.error("Job queue is not running, dropping job")
+            return False
+        try:
+            self._queue.put_nowait((func, args, kwargs))
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Job queue is full ({self.maxsize} pending jobs), dropping job")
+            return False
+
+    async def _worker(self, index: int):
+        while True:
+            func, args, kwargs = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Job failed in worker {index}: {e}")
+                traceback.print_exc()
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
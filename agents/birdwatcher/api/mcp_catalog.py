@@ -0,0 +1,88 @@
+import os
+import copy
+import logging
+from dataclasses import dataclass
+from typing import Callable, Hashable, List, Optional
+
+from agno.tools.function import Function
+from agno.tools.mcp import MCPTools, StreamableHTTPClientParams
+from agno.utils.mcp import get_entrypoint_for_tool
+from mcp.types import Tool
+
+from .cache import TTLCache
+from .http import create_mcp_http_client
+
+logger = logging.getLogger(__name__)
+
+# MCP tool definitions per (host, token fingerprint). Stale catalogs are served
+# while a background refresh lists the tools again.
+tool_catalog = TTLCache(
+    ttl=float(os.getenv("MCP_TOOLS_CACHE_TTL", 3600)),
+    stale_ttl=float(os.getenv("MCP_TOOLS_CACHE_TTL", 3600)),
+)
+
+
+@dataclass
+class MCPClientParams(StreamableHTTPClientParams):
+    """Streamable HTTP parameters of an MCP connection whose requests are reported in the HTTP metrics"""
+
+    terminate_on_close: Optional[bool] = True
+    httpx_client_factory: Callable = create_mcp_http_client
+
+
+class CachedMCPTools(MCPTools):
+    """
+    MCPTools that reuses the tool catalog of previous sessions to the same workspace.
+
+    The MCP session is still initialized, but the list-tools round trip is skipped
+    when the catalog is cached, and the tool definitions sent to the model stay
+    identical between runs.
+    """
+
+    def __init__(self, *args, catalog_key: Optional[Hashable] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.catalog_key = catalog_key
+
+    async def _list_tools(self) -> List[Tool]:
+        result = await self.session.list_tools()
+        return result.tools
+
+    async def initialize(self) -> None:
+        if self._initialized:
+            return
+
+        if self.catalog_key is None:
+            await super().initialize()
+            return
+
+        try:
+            if self.session is None:
+                raise ValueError("Session is not available. Use as context manager or provide a session.")
+
+            await self.session.initialize()
+            available_tools = await tool_catalog.get_or_load(self.catalog_key, self._list_tools)
+
+            self._check_tools_filters(
+                available_tools=[tool.name for tool in available_tools],
+                include_tools=self.include_tools,
+                exclude_tools=self.exclude_tools,
+            )
+
+            for tool in available_tools:
+                if self.exclude_tools and tool.name in self.exclude_tools:
+                    continue
+                if self.include_tools is not None and tool.name not in self.include_tools:
+                    continue
+                self.functions[tool.name] = Function(
+                    name=tool.name,
+                    description=tool.description,
+                    # Copy so agents processing the schema don't alter the cached one
+                    parameters=copy.deepcopy(tool.inputSchema),
+                    entrypoint=get_entrypoint_for_tool(tool, self.session),
+                    skip_entrypoint_processing=True,
+                )
+
+            self._initialized = True
+        except Exception as e:
+            logger.error(f"Failed to get MCP tools: {e}")
+            raise
@@ -0,0 +1,260 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import timedelta
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .mcp_catalog import CachedMCPTools, MCPClientParams
+from .workspaces import mcp_server_url, token_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class PooledMCPSession:
+    """
+    An MCPTools connection owned by a dedicated task.
+
+    The MCP streamable-http client runs inside anyio task groups, which must be
+    entered and exited from the same task. The owner task opens the connection,
+    then waits until the session is closed, so borrowers on other tasks can use it.
+    """
+
+    def __init__(self, key: Tuple[str, str], url: str, timeout_seconds: int = 300):
+        self.key = key
+        self.tools = CachedMCPTools(
+            transport="streamable-http",
+            server_params=MCPClientParams(url=url, timeout=timedelta(seconds=timeout_seconds)),
+            timeout_seconds=timeout_seconds,
+            catalog_key=key,
+        )
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.suspect = False
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def open(self):
+        self._task = asyncio.create_task(self._run(), name=f"mcp-session-{self.key[1]}")
+        await self._ready.wait()
+        if self._error:
+            await self._task
+            raise self._error
+
+    async def _run(self):
+        try:
+            async with self.tools:
+                self._ready.set()
+                await self._closing.wait()
+        except BaseException as e:
+            if not self._ready.is_set():
+                self._error = e
+                self._ready.set()
+            elif not isinstance(e, asyncio.CancelledError):
+                logger.warning(f"MCP session {self.key[1]} closed with error: {e}")
+
+    @property
+    def closed(self) -> bool:
+        return self._task is None or self._task.done()
+
+    async def ping(self) -> bool:
+        try:
+            await asyncio.wait_for(self.tools.session.send_ping(), timeout=10)
+            return True
+        except Exception as e:
+            logger.info(f"MCP session {self.key[1]} failed health check: {e}")
+            return False
+
+    async def close(self):
+        self._closing.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=10)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+
+
+class MCPSessionPool:
+    """
+    Pool of warm MCP sessions keyed by (Tinybird host, token fingerprint).
+
+    Sessions are borrowed exclusively, since agents bind themselves to the toolkit
+    functions. Idle sessions are evicted after `idle_timeout` seconds and checked
+    with a ping before reuse when idle for more than `health_check_after` seconds.
+    """
+
+    def __init__(
+        self,
+        max_sessions: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        health_check_after: Optional[float] = None,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            max_sessions (int, optional): Maximum open sessions across all keys. Defaults to MCP_POOL_MAX_SESSIONS or 20
+            idle_timeout (float, optional): Seconds before an idle session is closed. Defaults to MCP_POOL_IDLE_TIMEOUT or 300
+            health_check_after (float, optional): Idle seconds after which a session is pinged before reuse. Defaults to 30
+        """
+        self.max_sessions = max_sessions or int(os.getenv("MCP_POOL_MAX_SESSIONS", 20))
+        self.idle_timeout = idle_timeout or float(os.getenv("MCP_POOL_IDLE_TIMEOUT", 300))
+        self.health_check_after = health_check_after or float(os.getenv("MCP_POOL_HEALTH_CHECK_AFTER", 30))
+        self._idle: Dict[Tuple[str, str], List[PooledMCPSession]] = {}
+        self._size = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def idle_count(self) -> int:
+        return sum(len(sessions) for sessions in self._idle.values())
+
+    async def start(self):
+        """Start the background task evicting idle sessions"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep(), name="mcp-pool-sweeper")
+
+    async def close(self):
+        """Close every idle session and stop the sweeper"""
+        if self._sweeper:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        sessions = [s for idle in self._idle.values() for s in idle]
+        self._idle.clear()
+        for session in sessions:
+            await self._discard(session)
+
+    @asynccontextmanager
+    async def session(self, tinybird_host: Optional[str], tinybird_api_key: str):
+        """
+        Borrow a connected MCPTools for a Tinybird workspace.
+
+        Args:
+            tinybird_host (str, optional): Tinybird API host
+            tinybird_api_key (str): Tinybird token
+
+        Yields:
+            MCPTools: Initialized toolkit, do not enter or exit it
+        """
+        pooled = await self._acquire(tinybird_host, tinybird_api_key)
+        try:
+            yield pooled.tools
+        except BaseException:
+            # The connection may be broken, check it before the next use
+            pooled.suspect = True
+            raise
+        finally:
+            await self._release(pooled)
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def _acquire(self, tinybird_host: Optional[str], tinybird_api_key: str) -> PooledMCPSession:
+        key = (tinybird_host or "", token_fingerprint(tinybird_api_key))
+        condition = self._get_condition()
+        while True:
+            victim = None
+            async with condition:
+                pooled = self._pop_idle(key)
+                if pooled is None:
+                    if self._size >= self.max_sessions:
+                        # Make room by closing the least recently used idle session
+                        victim = self._pop_lru_idle()
+                        if victim is None:
+                            await condition.wait()
+                            continue
+                        self._size -= 1
+                    # Reserve a slot for the new session
+                    self._size += 1
+            if victim is not None:
+                await victim.close()
+
+            if pooled is not None:
+                if await self._healthy(pooled):
+                    pooled.last_used = time.monotonic()
+                    return pooled
+                await self._discard(pooled)
+                continue
+
+            try:
+                pooled = PooledMCPSession(key, mcp_server_url(tinybird_host, tinybird_api_key))
+                await pooled.open()
+            except BaseException:
+                await self._discard(None)
+                raise
+            logger.info(f"Opened MCP session for {key[0] or 'default host'} ({self._size}/{self.max_sessions})")
+            return pooled
+
+    async def _release(self, pooled: PooledMCPSession):
+        pooled.last_used = time.monotonic()
+        if pooled.closed:
+            await self._discard(pooled)
+            return
+        condition = self._get_condition()
+        async with condition:
+            self._idle.setdefault(pooled.key, []).append(pooled)
+            condition.notify()
+
+    def _pop_idle(self, key) -> Optional[PooledMCPSession]:
+        sessions = self._idle.get(key)
+        if not sessions:
+            return None
+        pooled = sessions.pop()
+        if not sessions:
+            del self._idle[key]
+        return pooled
+
+    def _pop_lru_idle(self) -> Optional[PooledMCPSession]:
+        candidates = [s for sessions in self._idle.values() for s in sessions]
+        if not candidates:
+            return None
+        victim = min(candidates, key=lambda s: s.last_used)
+        self._idle[victim.key].remove(victim)
+        if not self._idle[victim.key]:
+            del self._idle[victim.key]
+        return victim
+
+    async def _healthy(self, pooled: PooledMCPSession) -> bool:
+        if pooled.closed:
+            return False
+        if pooled.suspect or time.monotonic() - pooled.last_used > self.health_check_after:
+            if not await pooled.ping():
+                return False
+            pooled.suspect = False
+        return True
+
+    async def _discard(self, pooled: Optional[PooledMCPSession]):
+        """Close a session and free its slot"""
+        if pooled is not None:
+            await pooled.close()
+        condition = self._get_condition()
+        async with condition:
+            self._size = max(0, self._size - 1)
+            condition.notify()
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 30))
+            now = time.monotonic()
+            expired = []
+            for key in list(self._idle):
+                sessions = self._idle[key]
+                keep = [s for s in sessions if now - s.last_used < self.idle_timeout and not s.closed]
+                expired.extend(s for s in sessions if s not in keep)
+                if keep:
+                    self._idle[key] = keep
+                else:
+                    del self._idle[key]
+            for pooled in expired:
+                await self._discard(pooled)
+            if expired:
+                logger.info(f"Closed {len(expired)} idle MCP sessions")
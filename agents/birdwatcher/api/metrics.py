@@ -0,0 +1,220 @@
+import time
+import bisect
+import logging
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds, from cache lookups to long agent runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+INF_LABEL = 'le="+Inf"'
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """Base of the metric types, a family of samples per label values"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Sample lines of the metric in the Prometheus text format"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Set the value of a counter kept elsewhere, e.g. by a collector"""
+        self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}" for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}" for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (bucket counts, sum, count)
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            entry[0][index] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _format_number(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, INF_LABEL)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Metrics exposed in the Prometheus text format.
+
+    Besides the metrics updated as things happen, collectors are called on every
+    scrape to read state owned elsewhere, e.g. queue depth or cache counters.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Add a function that updates gauges and counters right before each scrape"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+slack_events = registry.counter("birdwatcher_slack_events_total", "Slack events received", ["type"])
+slack_events_deduped = registry.counter("birdwatcher_slack_events_deduped_total", "Slack events dropped as retries of processed messages")
+slack_events_rejected = registry.counter("birdwatcher_slack_events_rejected_total", "Slack events rejected because the job queue was full")
+job_queue_depth = registry.gauge("birdwatcher_job_queue_depth", "Slack events waiting for a worker")
+job_queue_in_flight = registry.gauge("birdwatcher_job_queue_in_flight", "Slack events being processed by a worker")
+agent_runs_in_flight = registry.gauge("birdwatcher_agent_runs_in_flight", "Agent runs in progress", ["source"])
+agent_run_duration = registry.histogram(
+    "birdwatcher_agent_run_duration_seconds", "Duration of agent runs", ["source", "mission", "model", "status"]
+)
+model_tokens = registry.counter("birdwatcher_model_tokens_total", "Tokens consumed by agent runs", ["model", "type"])
+http_request_duration = registry.histogram(
+    "birdwatcher_http_request_duration_seconds", "Duration of outbound HTTP requests", ["service", "method", "status"]
+)
+phase_duration = registry.histogram("birdwatcher_phase_duration_seconds", "Duration of the traced phases of a request", ["phase"])
+mcp_pool_sessions = registry.gauge("birdwatcher_mcp_pool_sessions", "Open MCP sessions", ["state"])
+cache_hits = registry.counter("birdwatcher_cache_hits_total", "Cache lookups served from the cache", ["cache"])
+cache_misses = registry.counter("birdwatcher_cache_misses_total", "Cache lookups that had to load the value", ["cache"])
+slack_api_requests = registry.counter("birdwatcher_slack_api_requests_total", "Slack API requests by outcome", ["outcome"])
+slack_api_pending = registry.gauge("birdwatcher_slack_api_pending", "Slack API requests waiting for a rate limit bucket or a retry")
+
+
+@contextmanager
+def track_agent_run(source: str, mission: Optional[str], model: Optional[str]):
+    """Count an agent run as in flight and record its duration and outcome"""
+    agent_runs_in_flight.inc(source=source)
+    start = time.monotonic()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        agent_runs_in_flight.dec(source=source)
+        agent_run_duration.observe(time.monotonic() - start, source=source, mission=mission or "custom", model=model or "", status=status)
+
+
+def record_token_usage(model: Optional[str], run_response):
+    """Add the tokens of an agno run response, its metrics hold one value per model call"""
+    metrics = getattr(run_response, "metrics", None) or {}
+    for kind in ("input_tokens", "output_tokens"):
+        values = metrics.get(kind) or []
+        total = sum(values) if isinstance(values, list) else values
+        if total:
+            model_tokens.inc(total, model=model or "", type=kind.replace("_tokens", ""))
@@ -1,29 +1,79 @@
 from aiohttp import web
 import json
 import os
-import aiohttp
 import re
 import asyncio
+from agno.run.response import RunEvent
 from birdwatcher import create_agno_agent
 from prompts import SYSTEM_PROMPT
 from textwrap import dedent
-import tempfile
-import time
 import random
 from datetime import datetime
 from .tinybird import create_tinybird_config, encrypt_token, decrypt_token
 from .thinking_messages import THINKING_MESSAGES
-
-# File to store processed message IDs
-PROCESSED_MESSAGES_FILE = os.path.join(tempfile.gettempdir(), "slack_bot_processed_messages.txt")
+from .thinking_matcher import thinking_matcher
+from .jobs import JobQueue
+from .dedup import create_dedup_backend
+from .http import init_http_sessions, close_http_sessions
+from .mcp_pool import MCPSessionPool
+from .streaming import StreamingMessage
+from .slack_dispatcher import slack_dispatcher
+from .cron import CronSchedule, DEFAULT_NOTIFICATION_SCHEDULE
+from .tracing import span, start_span, start_trace, flush_traces
+from .mcp_catalog import tool_catalog
+from . import metrics
+from .usage import track_run
+from .event_batcher import close_event_batchers
+
+# Store of recently processed message IDs, used to drop Slack retries
+dedup_store = create_dedup_backend()
 
 # Initialize TinybirdConfig instance
 tinybird_config = None
 
+# Warm MCP connections per Tinybird workspace, shared by agent runs
+mcp_pool = MCPSessionPool()
+
+# Background queue for agent runs, so Slack events are acknowledged right away
+job_queue = JobQueue()
+
 # Initialize aiohttp app
 app = web.Application()
 routes = web.RouteTableDef()
 
+async def start_job_queue(app):
+    await job_queue.start()
+
+async def stop_job_queue(app):
+    await job_queue.stop()
+
+async def start_mcp_pool(app):
+    await mcp_pool.start()
+
+async def close_mcp_pool(app):
+    await mcp_pool.close()
+
+def collect_metrics():
+    """Read the state of the queue, pools, caches and Slack dispatcher on each scrape"""
+    metrics.job_queue_depth.set(job_queue.qsize())
+    metrics.job_queue_in_flight.set(job_queue.in_flight)
+    metrics.mcp_pool_sessions.set(mcp_pool.idle_count(), state="idle")
+    metrics.mcp_pool_sessions.set(mcp_pool.size - mcp_pool.idle_count(), state="in_use")
+    caches = {"mcp_tool_catalog": {"hits": tool_catalog.hits, "misses": tool_catalog.misses}}
+    if tinybird_config:
+        caches.update(tinybird_config.cache_stats())
+    for name, stats in caches.items():
+        metrics.cache_hits.set_total(stats["hits"], cache=name)
+        metrics.cache_misses.set_total(stats["misses"], cache=name)
+    stats = slack_dispatcher.stats()
+    for outcome, value in stats.items():
+        # Per method counts would multiply the series, totals are enough to alert on
+        if outcome not in ("pending", "buckets") and "." not in outcome:
+            metrics.slack_api_requests.set_total(value, outcome=outcome)
+    metrics.slack_api_pending.set(stats["pending"])
+
+metrics.registry.add_collector(collect_metrics)
+
 async def init_tinybird_config():
     """Initialize TinybirdConfig with token from environment"""
     global tinybird_config
@@ -152,6 +202,7 @@ def create_notifications_modal(channel_id, existing_config=None):
     """Create the notifications subscription modal using Slack Blocks"""
     # Get existing notification types or default to empty list
     notification_types = existing_config.get("notification_types", []) if existing_config else []
+    schedule = existing_config.get("schedule", "") if existing_config else ""
     
     # Create initial options list only if there are selected types
     initial_options = []
@@ -241,6 +292,28 @@ def create_notifications_modal(channel_id, existing_config=None):
                     "text": "Notification Preferences"
                 },
                 "element": checkbox_element
+            },
+            {
+                "type": "input",
+                "block_id": "notification_schedule_block",
+                "optional": True,
+                "label": {
+                    "type": "plain_text",
+                    "text": "Schedule (cron, UTC)"
+                },
+                "hint": {
+                    "type": "plain_text",
+                    "text": f"Five field cron expression, e.g. 0 9 * * 1-5 for weekdays at 9:00 UTC. Defaults to {DEFAULT_NOTIFICATION_SCHEDULE}"
+                },
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "notification_schedule",
+                    "placeholder": {
+                        "type": "plain_text",
+                        "text": DEFAULT_NOTIFICATION_SCHEDULE
+                    },
+                    **({"initial_value": schedule} if schedule else {})
+                }
             }
         ]
     }
@@ -348,94 +421,23 @@ def create_mission_modal(channel_id, missions=None, selected_mission=None):
 
 def is_thinking_message(text):
     """Check if a message is one of the bot's thinking messages"""
-    if not text:
-        return False
-    
-    # Check against all thinking messages (remove emojis for comparison)
-    clean_text = re.sub(r'[^\w\s]', '', text.lower())
-    
-    for thinking_msg in THINKING_MESSAGES:
-        clean_thinking = re.sub(r'[^\w\s]', '', thinking_msg.lower())
-        if clean_thinking in clean_text or clean_text in clean_thinking:
-            return True
-    
-    # Also check for the old message format
-    if "analyzing your request" in clean_text or "processing your request" in clean_text:
-        return True
-        
-    return False
-
-def is_message_processed(message_id):
-    """Check if a message has already been processed"""
-    try:
-        if not os.path.exists(PROCESSED_MESSAGES_FILE):
-            return False
-        
-        current_time = time.time()
-        cutoff_time = current_time - 300  # 5 minutes ago
-        
-        with open(PROCESSED_MESSAGES_FILE, 'r') as f:
-            lines = f.readlines()
-        
-        # Check if message_id exists and clean up old entries
-        processed_ids = []
-        message_exists = False
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            parts = line.split('|')
-            if len(parts) == 2:
-                stored_id, timestamp_str = parts
-                try:
-                    timestamp = float(timestamp_str)
-                    if timestamp > cutoff_time:  # Keep recent entries
-                        processed_ids.append(line)
-                        if stored_id == message_id:
-                            message_exists = True
-                except ValueError:
-                    continue
-        
-        # Write back cleaned up entries
-        with open(PROCESSED_MESSAGES_FILE, 'w') as f:
-            f.write('\n'.join(processed_ids) + '\n')
-        
-        return message_exists
-    except Exception as e:
-        print(f"Error checking processed messages: {e}")
-        return False
-
-def mark_message_processed(message_id):
-    """Mark a message as processed"""
-    try:
-        current_time = time.time()
-        with open(PROCESSED_MESSAGES_FILE, 'a') as f:
-            f.write(f"{message_id}|{current_time}\n")
-    except Exception as e:
-        print(f"Error marking message as processed: {e}")
+    return thinking_matcher.matches(text)
 
-async def send_slack_message(channel: str, text: str, thread_ts: str = None, team_id: str = None):
-    """Send a message to Slack using aiohttp"""
-    # Get bot token from stored OAuth tokens
-    slack_token = None
-    bot_user_id = None
+async def get_bot_token(team_id: str = None):
+    """Get the bot token of a team from stored OAuth tokens"""
     if team_id:
         tokens = await get_slack_tokens_for_team(team_id)
         if tokens:
-            slack_token = tokens.get("bot_token")
-            bot_user_id = tokens.get("bot_user_id")
-        else:
-            # Fallback to environment variable for backward compatibility
-            slack_token = os.environ.get("SLACK_TOKEN", "")
-    else:
-        # Fallback to environment variable for backward compatibility
-        slack_token = os.environ.get("SLACK_TOKEN", "")
-    
+            return tokens.get("bot_token")
+    # Fallback to environment variable for backward compatibility
+    return os.environ.get("SLACK_TOKEN", "")
+
+async def send_slack_message(channel: str, text: str, thread_ts: str = None, team_id: str = None):
+    """Send a message to Slack using aiohttp, returns the ts of the posted message or None"""
+    slack_token = await get_bot_token(team_id)
     if not slack_token:
         print("ERROR: No SLACK_TOKEN found!")
-        return False
+        return None
 
     slack_data = {"channel": channel, "text": text}
     if thread_ts:
@@ -447,30 +449,63 @@ async def send_slack_message(channel: str, text: str, thread_ts: str = None, tea
     print(f"DEBUG: Slack payload: {json.dumps(slack_data, indent=2)}")
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://slack.com/api/chat.postMessage",
-                json=slack_data,
-                headers={
-                    "Authorization": f"Bearer {slack_token}",
-                    "Content-Type": "application/json",
-                }
-            ) as response:
-                response_data = await response.json()
-                print(f"DEBUG: Slack API response: {response_data}")
-
-                if not response_data.get("ok"):
-                    print(f"Slack API error: {response_data.get('error')}")
-                    print(f"Full error response: {response_data}")
-                    return False
-                else:
-                    print(f"DEBUG: Message sent successfully. Response ts: {response_data.get('ts')}")
-                    return True
+        response_data = await slack_dispatcher.call(
+            "chat.postMessage", slack_token, slack_data, team_id=team_id
+        )
+        print(f"DEBUG: Slack API response: {response_data}")
+
+        if not response_data.get("ok"):
+            print(f"Slack API error: {response_data.get('error')}")
+            print(f"Full error response: {response_data}")
+            return None
+        else:
+            print(f"DEBUG: Message sent successfully. Response ts: {response_data.get('ts')}")
+            return response_data.get("ts")
 
     except Exception as e:
         print(f"Error sending Slack message: {e}")
         import traceback
         traceback.print_exc()
+        return None
+
+async def update_slack_message(channel: str, ts: str, text: str, team_id: str = None):
+    """Edit a message previously posted by the bot"""
+    slack_token = await get_bot_token(team_id)
+    if not slack_token:
+        print("ERROR: No SLACK_TOKEN found!")
+        return False
+
+    try:
+        response_data = await slack_dispatcher.call(
+            "chat.update", slack_token, {"channel": channel, "ts": ts, "text": text}, team_id=team_id
+        )
+        if not response_data.get("ok"):
+            print(f"Slack API error updating message {ts}: {response_data.get('error')}")
+            return False
+        return True
+
+    except Exception as e:
+        print(f"Error updating Slack message: {e}")
+        return False
+
+async def delete_slack_message(channel: str, ts: str, team_id: str = None):
+    """Delete a message previously posted by the bot"""
+    slack_token = await get_bot_token(team_id)
+    if not slack_token:
+        print("ERROR: No SLACK_TOKEN found!")
+        return False
+
+    try:
+        response_data = await slack_dispatcher.call(
+            "chat.delete", slack_token, {"channel": channel, "ts": ts}, team_id=team_id
+        )
+        if not response_data.get("ok"):
+            print(f"Slack API error deleting message {ts}: {response_data.get('error')}")
+            return False
+        return True
+
+    except Exception as e:
+        print(f"Error deleting Slack message: {e}")
         return False
 
 async def send_followup_response(response_url: str, text: str):
@@ -481,15 +516,10 @@ async def send_followup_response(response_url: str, text: str):
             "text": text
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                response_url,
-                json=response_data,
-                headers={"Content-Type": "application/json"}
-            ) as response:
-                if response.status != 200:
-                    print(f"Error sending follow-up response: {await response.text()}")
-                return response.status == 200
+        result = await slack_dispatcher.post_response_url(response_url, response_data)
+        if not result.get("ok"):
+            print(f"Error sending follow-up response: {result.get('error')}")
+        return result.get("ok", False)
     except Exception as e:
         print(f"Error sending follow-up response: {e}")
         return False
@@ -512,20 +542,19 @@ async def get_thread_history(channel: str, thread_ts: str, limit: int = 50, team
         return []
     
     try:
-        url = f"https://slack.com/api/conversations.replies?channel={channel}&ts={thread_ts}&limit={limit}"
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url,
-                headers={"Authorization": f"Bearer {slack_token}"}
-            ) as response:
-                data = await response.json()
-            
-            if data.get("ok"):
-                return data.get("messages", [])
-            else:
-                print(f"Slack API error fetching thread: {data.get('error', 'Unknown error')}")
-                return []
+        data = await slack_dispatcher.call(
+            "conversations.replies",
+            slack_token,
+            {"channel": channel, "ts": thread_ts, "limit": limit},
+            team_id=team_id,
+            http_method="GET",
+        )
+
+        if data.get("ok"):
+            return data.get("messages", [])
+        else:
+            print(f"Slack API error fetching thread: {data.get('error', 'Unknown error')}")
+            return []
                 
     except Exception as e:
         print(f"Error fetching thread history: {e}")
@@ -561,15 +590,22 @@ async def handle_slack(request):
                 event = data.get("event", {})
                 event_type = event.get("type", "")
                 team_id = data.get("team_id")  # team_id is at the top level of event_callback
+                metrics.slack_events.inc(type=event_type)
 
                 if event_type in ["message", "app_mention", "message.im"]:
                     # Add team_id to the event for easier access
                     event["team_id"] = team_id
-                    await handle_slack_event(event)
+                    # Ack immediately, the agent runs on a background worker
+                    if not job_queue.enqueue(handle_slack_event, event):
+                        metrics.slack_events_rejected.inc()
+                        return web.json_response({
+                            "status": "error",
+                            "message": "Too many pending events, try again later"
+                        }, status=503)
 
                 return web.json_response({
                     "status": "success",
-                    "message": "Event processed successfully"
+                    "message": "Event queued successfully"
                 })
 
         except json.JSONDecodeError:
@@ -649,19 +685,15 @@ async def handle_slack(request):
                                 view_id = view.get("id")
                                 print(f"[block_actions] view_id: {view_id}, slack_token exists: {bool(slack_token)}")
                                 if slack_token and view_id:
-                                    async with aiohttp.ClientSession() as session:
-                                        async with session.post(
-                                            "https://slack.com/api/views.update",
-                                            json={"view_id": view_id, "view": new_modal},
-                                            headers={
-                                                "Authorization": f"Bearer {slack_token}",
-                                                "Content-Type": "application/json"
-                                            }
-                                        ) as resp:
-                                            resp_data = await resp.json()
-                                            print(f"[block_actions] Slack views.update response: {json.dumps(resp_data, indent=2)}")
-                                            if not resp_data.get("ok"):
-                                                print(f"[block_actions] Error from Slack API: {resp_data.get('error')}")
+                                    resp_data = await slack_dispatcher.call(
+                                        "views.update",
+                                        slack_token,
+                                        {"view_id": view_id, "view": new_modal},
+                                        team_id=team_id,
+                                    )
+                                    print(f"[block_actions] Slack views.update response: {json.dumps(resp_data, indent=2)}")
+                                    if not resp_data.get("ok"):
+                                        print(f"[block_actions] Error from Slack API: {resp_data.get('error')}")
                                 else:
                                     print(f"[block_actions] Missing slack_token or view_id, cannot update modal.")
                                 return web.json_response({})
@@ -788,7 +820,6 @@ async def slack_oauth_callback(request):
         return web.Response(text="Missing SLACK_CLIENT_ID or SLACK_CLIENT_SECRET in environment.", status=500)
 
     # Exchange code for access token
-    token_url = "https://slack.com/api/oauth.v2.access"
     data = {
         "client_id": client_id,
         "client_secret": client_secret,
@@ -797,49 +828,50 @@ async def slack_oauth_callback(request):
     if redirect_uri:
         data["redirect_uri"] = redirect_uri
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(token_url, data=data) as resp:
-            slack_response = await resp.json()
-            print(f"Slack OAuth response: {slack_response}")
-            if slack_response.get("ok"):
-                # Store the OAuth tokens in Tinybird
-                team_id = slack_response.get("team", {}).get("id")
-                bot_token = slack_response.get("access_token")
-                bot_user_id = slack_response.get("bot_user_id")
-                authed_user_id = slack_response.get("authed_user", {}).get("id")
+    slack_response = await slack_dispatcher.call("oauth.v2.access", payload=data, form=True)
+    print(f"Slack OAuth response: {slack_response}")
+    if slack_response.get("ok"):
+        # Store the OAuth tokens in Tinybird
+        team_id = slack_response.get("team", {}).get("id")
+        bot_token = slack_response.get("access_token")
+        bot_user_id = slack_response.get("bot_user_id")
+        authed_user_id = slack_response.get("authed_user", {}).get("id")
+            
+        if team_id and bot_token and bot_user_id:
+            # Initialize Tinybird config
+            if not tinybird_config:
+                if not await init_tinybird_config():
+                    return web.Response(text="Failed to initialize Tinybird config", status=500)
                 
-                if team_id and bot_token and bot_user_id:
-                    # Initialize Tinybird config
-                    if not tinybird_config:
-                        if not await init_tinybird_config():
-                            return web.Response(text="Failed to initialize Tinybird config", status=500)
-                    
-                    # Save the OAuth tokens
-                    success = await tinybird_config.save_slack_oauth_tokens(
-                        team_id=team_id,
-                        bot_token=bot_token,
-                        bot_user_id=bot_user_id,
-                        authed_user_id=authed_user_id
-                    )
-                    
-                    if success:
-                        return web.Response(
-                            text="App installed successfully! Your Slack workspace is now connected to Birdwatcher. You can close this window.", 
-                            content_type="text/plain"
-                        )
-                    else:
-                        return web.Response(
-                            text="App installed but failed to save configuration. Please contact support.", 
-                            content_type="text/plain"
-                        )
-                else:
-                    return web.Response(
-                        text="App installed but missing required tokens. Please contact support.", 
-                        content_type="text/plain"
-                    )
+            # Drop tokens cached from a previous installation
+            tinybird_config.invalidate_slack_oauth_tokens(team_id)
+
+            # Save the OAuth tokens, this also caches the new ones
+            success = await tinybird_config.save_slack_oauth_tokens(
+                team_id=team_id,
+                bot_token=bot_token,
+                bot_user_id=bot_user_id,
+                authed_user_id=authed_user_id
+            )
+                
+            if success:
+                return web.Response(
+                    text="App installed successfully! Your Slack workspace is now connected to Birdwatcher. You can close this window.", 
+                    content_type="text/plain"
+                )
             else:
-                err = slack_response.get("error", "Unknown error")
-                return web.Response(text=f"Slack OAuth failed: {err}", status=400)
+                return web.Response(
+                    text="App installed but failed to save configuration. Please contact support.", 
+                    content_type="text/plain"
+                )
+        else:
+            return web.Response(
+                text="App installed but missing required tokens. Please contact support.", 
+                content_type="text/plain"
+            )
+    else:
+        err = slack_response.get("error", "Unknown error")
+        return web.Response(text=f"Slack OAuth failed: {err}", status=400)
 
 async def get_slack_tokens_for_team(team_id: str):
     """Get Slack OAuth tokens for a specific team from Tinybird"""
@@ -850,7 +882,20 @@ async def get_slack_tokens_for_team(team_id: str):
     tokens = await tinybird_config.get_slack_oauth_tokens(team_id)
     return tokens
 
+async def get_channel_bundle(team_id: str, channel_id: str, user_id: str):
+    """Get configuration, missions and Slack tokens for a channel in one round trip"""
+    if not tinybird_config:
+        if not await init_tinybird_config():
+            return {"config": None, "missions": [], "slack_tokens": None}
+    return await tinybird_config.get_channel_bundle(team_id, channel_id, user_id)
+
 async def handle_slack_event(event):
+    """Handle a message event inside a trace keyed by its message ID"""
+    message_id = f"{event.get('channel', '')}_{event.get('ts', '')}_{event.get('user', '')}"
+    with start_trace("slack.event", message_id, channel=event.get("channel"), team_id=event.get("team_id")):
+        await _handle_slack_event(event)
+
+async def _handle_slack_event(event):
     try:
         # Allow USLACKBOT messages if they're reminders
         is_reminder = "Reminder:" in event.get("text", "")
@@ -869,7 +914,8 @@ async def handle_slack_event(event):
         # Get bot user ID from stored tokens or fallback to environment
         bot_user_id = None
         if team_id:
-            tokens = await get_slack_tokens_for_team(team_id)
+            with span("slack.tokens"):
+                tokens = await get_slack_tokens_for_team(team_id)
             if tokens:
                 bot_user_id = tokens.get("bot_user_id")
         
@@ -897,14 +943,15 @@ async def handle_slack_event(event):
         # Create unique message ID for deduplication
         message_id = f"{channel}_{ts}_{user}"
         
-        # For non-reminder messages, check if already processed
-        if is_message_processed(message_id):
+        # Check and mark the message as processed BEFORE sending any responses
+        with span("dedup") as dedup_span:
+            duplicate = await dedup_store.check_and_mark(message_id)
+            dedup_span.set(duplicate=duplicate)
+        if duplicate:
             print(f"Message already processed, skipping: {message_id}")
+            metrics.slack_events_deduped.inc()
             return
 
-        # Mark message as processed BEFORE sending any responses
-        mark_message_processed(message_id)
-
         reply_thread_ts = thread_ts or ts
 
         print(f"=== EVENT DEBUG ===")
@@ -945,7 +992,8 @@ async def handle_slack_event(event):
 
         # For reminders, check if we've already responded in the thread
         if is_reminder and thread_ts:
-            thread_messages = await get_thread_history(channel, thread_ts, team_id=team_id)
+            with span("slack.thread_history"):
+                thread_messages = await get_thread_history(channel, thread_ts, team_id=team_id)
             for msg in thread_messages:
                 if msg.get("user") == bot_user_id and not is_thinking_message(msg.get("text", "")):
                     print(f"Already responded to reminder in thread, skipping: {message_id}")
@@ -953,23 +1001,33 @@ async def handle_slack_event(event):
 
         # Send thinking message only if not from USLACKBOT
         print(f"Sending thinking message to channel {channel}, reply_thread_ts: {reply_thread_ts}")
-        await send_slack_message(
-            channel,
-            random.choice(THINKING_MESSAGES),
-            reply_thread_ts,
-            team_id,
-        )
+        with span("slack.post_thinking"):
+            placeholder_ts = await send_slack_message(
+                channel,
+                random.choice(THINKING_MESSAGES),
+                reply_thread_ts,
+                team_id,
+            )
+
+        # Stream the progress of the agent into the thinking message
+        stream = None
+        if placeholder_ts:
+            async def update_placeholder(text):
+                return await update_slack_message(channel, placeholder_ts, text, team_id)
+            stream = StreamingMessage(update_placeholder)
 
         # Process with Agno
         try:
-            response = await process_with_agno(
-                user_message, user, channel, reply_thread_ts, team_id
-            )
+            with span("agent.process"):
+                response = await process_with_agno(
+                    user_message, user, channel, reply_thread_ts, team_id, stream=stream
+                )
 
             print(f"Sending response to channel {channel}, reply_thread_ts: {reply_thread_ts}")
-            await send_slack_message(
-                channel, f"<@{user}> {response}", reply_thread_ts, team_id
-            )
+            with span("slack.post_final", streamed=stream is not None):
+                await send_final_message(
+                    channel, f"<@{user}> {response}", reply_thread_ts, team_id, stream, placeholder_ts
+                )
         except Exception as e:
             print(f"Error in process_with_agno or sending message: {e}")
             import traceback
@@ -978,7 +1036,8 @@ async def handle_slack_event(event):
             # Send error message to Slack as fallback
             error_message = f"<@{user}> ❌ Sorry, I encountered an unexpected error while processing your request. Please try again or contact support if the issue persists."
             try:
-                await send_slack_message(channel, error_message, reply_thread_ts, team_id)
+                with span("slack.post_final", streamed=stream is not None, error=True):
+                    await send_final_message(channel, error_message, reply_thread_ts, team_id, stream, placeholder_ts)
             except Exception as send_error:
                 print(f"Failed to send error message to Slack: {send_error}")
 
@@ -987,27 +1046,79 @@ async def handle_slack_event(event):
         import traceback
         traceback.print_exc()
 
+async def stream_agent_run(agent, message: str, user_id: str, session_id: str, stream: StreamingMessage):
+    """Run the agent streaming partial content and tool steps, returns the final RunResponse"""
+    tool_spans = {}
+    async for event in await agent.arun(
+        message,
+        user_id=user_id,
+        session_id=session_id,
+        stream=True,
+        show_full_reasoning=True,
+        show_reasoning=True,
+        stream_intermediate_steps=True,
+    ):
+        if event.event == RunEvent.run_response_content.value:
+            if isinstance(event.content, str):
+                stream.add_content(event.content)
+        elif event.event == RunEvent.tool_call_started.value and event.tool:
+            stream.tool_started(event.tool.tool_name)
+            tool_spans[event.tool.tool_call_id] = start_span("tool.call", tool=event.tool.tool_name)
+        elif event.event == RunEvent.tool_call_completed.value and event.tool:
+            stream.tool_completed(event.tool.tool_name, error=bool(event.tool.tool_call_error))
+            tool_span = tool_spans.pop(event.tool.tool_call_id, None)
+            if tool_span:
+                tool_span.end(error="tool call error" if event.tool.tool_call_error else None)
+    return agent.run_response
+
+async def send_final_message(
+    channel: str,
+    text: str,
+    thread_ts: str,
+    team_id: str,
+    stream: StreamingMessage = None,
+    placeholder_ts: str = None,
+):
+    """Replace the streamed thinking message with the answer, or post it if that's not possible"""
+    if stream and await stream.finish(text):
+        return
+    if stream and placeholder_ts:
+        # Don't leave partial content behind, it would pass for an answer in the thread history
+        if not await delete_slack_message(channel, placeholder_ts, team_id):
+            await update_slack_message(channel, placeholder_ts, random.choice(THINKING_MESSAGES), team_id)
+    await send_slack_message(channel, text, thread_ts, team_id)
+
 async def process_with_agno(
-    message: str, user_id: str, channel: str = None, thread_ts: str = None, team_id: str = None
+    message: str,
+    user_id: str,
+    channel: str = None,
+    thread_ts: str = None,
+    team_id: str = None,
+    stream: StreamingMessage = None,
 ) -> str:
     try:
-        # Get Slack bot token for the team if team_id is provided
-        slack_token = None
-        if team_id:
-            tokens = await get_slack_tokens_for_team(team_id)
-            if tokens:
-                slack_token = tokens.get("bot_token")
-        
+        # Get channel configuration, missions and Slack tokens in one round trip
+        with span("tinybird.channel_bundle"):
+            bundle = await get_channel_bundle(team_id, channel, user_id)
+        tokens = bundle["slack_tokens"]
+        slack_token = tokens.get("bot_token") if tokens else None
+
         # Check if we're in a thread and gather context if it was created by the bot
         thread_context = ""
         if thread_ts and channel:
             print(f"Fetching thread history for thread_ts: {thread_ts}")
-            thread_messages = await get_thread_history(channel, thread_ts, team_id=team_id)
+            with span("slack.thread_history"):
+                thread_messages = await get_thread_history(channel, thread_ts, team_id=team_id)
             print(f"Thread messages: {thread_messages}")
             
             if thread_messages:
                 print("Extracting full thread context...")
                 
+                # Identify bot messages using the bot user ID of the team
+                bot_user_id = tokens.get("bot_user_id") if tokens else None
+                if not bot_user_id:
+                    bot_user_id = os.environ.get("SLACK_BOT_USER_ID", "U08V1K4MXFD")
+
                 # Build full thread context with all messages
                 thread_context = ""
                 for i, msg in enumerate(thread_messages):
@@ -1021,15 +1132,6 @@ async def process_with_agno(
                     
                     if clean_text:
                         # Identify if it's a bot message or user message
-                        bot_user_id = None
-                        if team_id:
-                            tokens = await get_slack_tokens_for_team(team_id)
-                            if tokens:
-                                bot_user_id = tokens.get("bot_user_id")
-                        
-                        if not bot_user_id:
-                            bot_user_id = os.environ.get("SLACK_BOT_USER_ID", "U08V1K4MXFD")
-                        
                         is_bot = user_id_msg == bot_user_id or _user_id == bot_user_id or _user_id == "USLACKBOT"
                         sender_type = "Bot" if is_bot else "User"
                         
@@ -1038,8 +1140,7 @@ async def process_with_agno(
                             thread_context += f"Message {i+1} ({sender_type}): {clean_text}\n"
                 print(f"Added full thread context: {thread_context}")
 
-        # Get channel configuration
-        channel_config = await get_channel_config(channel, user_id)
+        channel_config = bundle["config"]
         if not channel_config:
             return "❌ No configuration found for this channel. Please use `/birdwatcher-config` to set up the agent first."
 
@@ -1051,7 +1152,8 @@ async def process_with_agno(
             return "❌ No Tinybird token or host configured for this channel. Please use `/birdwatcher-config` to set up the agent first."
 
         try:
-            tinybird_token = decrypt_token(encrypted_token)
+            with span("decrypt"):
+                tinybird_token = decrypt_token(encrypted_token)
             if not tinybird_token or not tinybird_host:
                 return "❌ Error decrypting Tinybird token or host. Please reconfigure the channel using `/birdwatcher-config`."
         except Exception as e:
@@ -1059,7 +1161,6 @@ async def process_with_agno(
             return "❌ Error decrypting Tinybird token or host. Please reconfigure the channel using `/birdwatcher-config`."
 
         agent = None
-        mcp_tools = None
         try:
             if thread_ts:
                 session_id = f"slack_{channel}_{thread_ts}"
@@ -1071,12 +1172,7 @@ async def process_with_agno(
             # Mission selection logic
             selected_mission_text = None
             if tinybird_config:
-                missions_result = await tinybird_config.get_missions(channel)
-                missions = []
-                if missions_result and isinstance(missions_result, list):
-                    missions = missions_result
-                elif missions_result and isinstance(missions_result, dict):
-                    missions = missions_result.get('missions', [])
+                missions = bundle["missions"]
                 print(f"[Mission Selection] Missions fetched for channel {channel}: {missions}")
 
                 match = re.search(r'`([^`]+)`', message)
@@ -1118,26 +1214,36 @@ async def process_with_agno(
             else:
                 mission = "explore"
 
-            agent, mcp_tools, _ = await create_agno_agent(
-                system_prompt=SYSTEM_PROMPT,
-                instructions=instructions,
-                mission=mission,
-                markdown=False,
-                tinybird_host=tinybird_host,
-                tinybird_api_key=tinybird_token,
-                slack_token=slack_token,  # Pass the OAuth bot token to the agent
-            )
+            # Borrow a warm MCP connection for the workspace instead of opening one per message
+            mcp_connect = start_span("mcp.connect")
+            async with mcp_pool.session(tinybird_host, tinybird_token) as mcp_tools:
+                mcp_connect.end()
+                with span("agent.create", mission=mission or "custom"):
+                    agent, _ = await create_agno_agent(
+                        system_prompt=SYSTEM_PROMPT,
+                        instructions=instructions,
+                        mission=mission,
+                        markdown=False,
+                        tinybird_host=tinybird_host,
+                        tinybird_api_key=tinybird_token,
+                        slack_token=slack_token,  # Pass the OAuth bot token to the agent
+                        mcp_tools=mcp_tools,
+                    )
 
-            async with mcp_tools:
-                result = await agent.arun(
-                    message,
-                    user_id=user_id,
-                    session_id=session_id,
-                    stream=False,
-                    show_full_reasoning=True,
-                    show_reasoning=True,
-                    stream_intermediate_steps=True,
-                )
+                with span("agent.run", model=agent.model.id, stream=stream is not None), \
+                        track_run(agent, "slack", mission, channel_id=channel, team_id=team_id, user_id=user_id):
+                    if stream:
+                        result = await stream_agent_run(agent, message, user_id, session_id, stream)
+                    else:
+                        result = await agent.arun(
+                            message,
+                            user_id=user_id,
+                            session_id=session_id,
+                            stream=False,
+                            show_full_reasoning=True,
+                            show_reasoning=True,
+                            stream_intermediate_steps=True,
+                        )
 
                 if hasattr(result, "content"):
                     return str(result.content) if result.content else "I've completed the analysis, but no specific response was generated."
@@ -1187,12 +1293,6 @@ async def process_with_agno(
             
             return f"Sorry, I encountered an error processing your request: {str(e)}"
         finally:
-            try:
-                if mcp_tools and hasattr(mcp_tools, "aclose"):
-                    await mcp_tools.aclose()
-            except Exception as cleanup_error:
-                print(f"Warning: Error during MCP tools cleanup: {cleanup_error}")
-
             try:
                 await asyncio.sleep(0.1)
             except Exception:
@@ -1234,27 +1334,20 @@ async def handle_config_command(parsed_data):
             return
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://slack.com/api/views.open",
-                    json={
-                        "trigger_id": trigger_id,
-                        "view": modal
-                    },
-                    headers={
-                        "Authorization": f"Bearer {slack_token}",
-                        "Content-Type": "application/json"
-                    }
-                ) as response:
-                    response_data = await response.json()
-
-                    if not response_data.get("ok"):
-                        error_msg = response_data.get("error", "Unknown error")
-                        await send_followup_response(
-                            response_url,
-                            f"❌ Error opening configuration modal: {error_msg}"
-                        )
-                        return
+            response_data = await slack_dispatcher.call(
+                "views.open",
+                slack_token,
+                {"trigger_id": trigger_id, "view": modal},
+                team_id=team_id,
+            )
+
+            if not response_data.get("ok"):
+                error_msg = response_data.get("error", "Unknown error")
+                await send_followup_response(
+                    response_url,
+                    f"❌ Error opening configuration modal: {error_msg}"
+                )
+                return
 
         except Exception as e:
             print(f"Error opening modal: {e}")
@@ -1304,27 +1397,20 @@ async def handle_notifications_command(parsed_data):
             return
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://slack.com/api/views.open",
-                    json={
-                        "trigger_id": trigger_id,
-                        "view": modal
-                    },
-                    headers={
-                        "Authorization": f"Bearer {slack_token}",
-                        "Content-Type": "application/json"
-                    }
-                ) as response:
-                    response_data = await response.json()
-
-                    if not response_data.get("ok"):
-                        error_msg = response_data.get("error", "Unknown error")
-                        await send_followup_response(
-                            response_url,
-                            f"❌ Error opening notifications modal: {error_msg}"
-                        )
-                        return
+            response_data = await slack_dispatcher.call(
+                "views.open",
+                slack_token,
+                {"trigger_id": trigger_id, "view": modal},
+                team_id=team_id,
+            )
+
+            if not response_data.get("ok"):
+                error_msg = response_data.get("error", "Unknown error")
+                await send_followup_response(
+                    response_url,
+                    f"❌ Error opening notifications modal: {error_msg}"
+                )
+                return
 
         except Exception as e:
             print(f"Error opening modal: {e}")
@@ -1360,21 +1446,13 @@ async def send_ephemeral_message(channel: str, user: str, text: str, team_id: st
             print("ERROR: No SLACK_TOKEN found!")
             return False
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://slack.com/api/chat.postEphemeral",
-                json={
-                    "channel": channel,
-                    "user": user,
-                    "text": text
-                },
-                headers={
-                    "Authorization": f"Bearer {slack_token}",
-                    "Content-Type": "application/json",
-                }
-            ) as response:
-                response_data = await response.json()
-                return response_data.get("ok", False)
+        response_data = await slack_dispatcher.call(
+            "chat.postEphemeral",
+            slack_token,
+            {"channel": channel, "user": user, "text": text},
+            team_id=team_id,
+        )
+        return response_data.get("ok", False)
     except Exception as e:
         print(f"Error sending ephemeral message: {e}")
         return False
@@ -1435,10 +1513,22 @@ async def handle_modal_submission(payload):
             
             # Convert selected options to a list of values
             notification_types = [option.get("value") for option in selected_options]
+            schedule = (values.get("notification_schedule_block", {}).get("notification_schedule", {}).get("value") or "").strip()
+            if schedule:
+                try:
+                    CronSchedule(schedule).next_after(datetime.utcnow())
+                except ValueError as e:
+                    return {
+                        "response_action": "errors",
+                        "errors": {
+                            "notification_schedule_block": str(e)
+                        }
+                    }
             
             # Save notification preferences
             config = {
                 "notification_types": notification_types,
+                "schedule": schedule,
                 "updated_by": user_id,
                 "channel_id": channel_id,
                 "updated_at": datetime.now().isoformat()
@@ -1526,17 +1616,13 @@ async def handle_mission_command(parsed_data):
             await send_followup_response(response_url, "❌ Error: Bot token not configured")
             return
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://slack.com/api/views.open",
-                    json={"trigger_id": trigger_id, "view": modal},
-                    headers={"Authorization": f"Bearer {slack_token}", "Content-Type": "application/json"}
-                ) as response:
-                    response_data = await response.json()
-                    if not response_data.get("ok"):
-                        error_msg = response_data.get("error", "Unknown error")
-                        await send_followup_response(response_url, f"❌ Error opening mission modal: {error_msg}")
-                        return
+            response_data = await slack_dispatcher.call(
+                "views.open", slack_token, {"trigger_id": trigger_id, "view": modal}, team_id=team_id
+            )
+            if not response_data.get("ok"):
+                error_msg = response_data.get("error", "Unknown error")
+                await send_followup_response(response_url, f"❌ Error opening mission modal: {error_msg}")
+                return
         except Exception as e:
             print(f"Error opening mission modal: {e}")
             await send_followup_response(response_url, f"❌ Error opening mission modal: {str(e)}")
@@ -1545,8 +1631,21 @@ async def handle_mission_command(parsed_data):
         if "response_url" in locals():
             await send_followup_response(response_url, f"❌ Error processing mission command: {str(e)}")
 
+@routes.get('/metrics')
+async def handle_metrics(request):
+    """Prometheus scrape endpoint"""
+    return web.Response(text=metrics.registry.render(), content_type="text/plain", charset="utf-8")
+
 # Add the routes to the app
 app.add_routes(routes)
+app.on_startup.append(init_http_sessions)
+app.on_startup.append(start_mcp_pool)
+app.on_startup.append(start_job_queue)
+app.on_cleanup.append(stop_job_queue)
+app.on_cleanup.append(close_mcp_pool)
+app.on_cleanup.append(flush_traces)
+app.on_cleanup.append(close_event_batchers)
+app.on_cleanup.append(close_http_sessions)
 
 def run_server():
     web.run_app(app, host='0.0.0.0', port=8000)
@@ -0,0 +1,222 @@
+import os
+import time
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from .http import get_session
+
+logger = logging.getLogger(__name__)
+
+SLACK_API_URL = os.getenv("SLACK_API_URL", "https://slack.com/api").rstrip("/")
+
+# Requests per second and burst per (team, method, channel), based on Slack's rate limit tiers.
+# chat.postMessage is limited to about one message per second and channel.
+METHOD_LIMITS: Dict[str, Tuple[float, int]] = {
+    "chat.postMessage": (1.0, 3),
+    "chat.postEphemeral": (1.0, 3),
+    "chat.update": (50 / 60, 3),
+    "conversations.replies": (50 / 60, 5),
+    "views.open": (100 / 60, 5),
+    "views.update": (100 / 60, 5),
+    "oauth.v2.access": (100 / 60, 5),
+    "response_url": (1.0, 3),
+}
+DEFAULT_LIMIT = (20 / 60, 3)
+
+# Slack errors worth retrying, anything else is returned to the caller as is
+RETRYABLE_ERRORS = {"ratelimited", "internal_error", "fatal_error", "service_unavailable", "request_timeout"}
+
+
+class TokenBucket:
+    """Token bucket that can also be paused, e.g. while Slack asks to retry later"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked() or self.paused_until > time.monotonic()
+
+    async def acquire(self):
+        # The lock makes waiters take tokens in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SlackDispatcher:
+    """
+    Sends every outbound Slack API request, enforcing rate limits before Slack does.
+
+    Requests are limited with a token bucket per (team, method, channel). A 429
+    pauses the bucket for the Retry-After seconds and the request is retried, as
+    are transient errors, up to `max_retries` times. At most `max_pending`
+    requests wait for a bucket or a retry at once, the rest are rejected right
+    away instead of piling up.
+    """
+
+    def __init__(
+        self,
+        max_retries: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        max_buckets: int = 10000,
+    ):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            max_retries (int, optional): Retries per request. Defaults to SLACK_MAX_RETRIES or 3
+            max_pending (int, optional): Requests waiting at once. Defaults to SLACK_MAX_PENDING or 1000
+            max_buckets (int): Rate limit buckets kept, the least recently used idle ones are dropped
+        """
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("SLACK_MAX_RETRIES", 3))
+        self.max_pending = max_pending or int(os.getenv("SLACK_MAX_PENDING", 1000))
+        self.max_buckets = max_buckets
+        self.pending = 0
+        self.metrics: Counter = Counter()
+        self._buckets: "OrderedDict[tuple, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, key: tuple) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(*METHOD_LIMITS.get(key[1], DEFAULT_LIMIT))
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_buckets:
+                for old_key in list(self._buckets):
+                    if len(self._buckets) <= self.max_buckets:
+                        break
+                    if not self._buckets[old_key].busy:
+                        del self._buckets[old_key]
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of the requests sent so far, plus the current queue state"""
+        return {**self.metrics, "pending": self.pending, "buckets": len(self._buckets)}
+
+    async def call(
+        self,
+        method: str,
+        token: Optional[str] = None,
+        payload: Optional[Dict[str, Any]] = None,
+        team_id: Optional[str] = None,
+        channel: Optional[str] = None,
+        http_method: str = "POST",
+        form: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Call a Slack Web API method.
+
+        Args:
+            method (str): API method, e.g. chat.postMessage
+            token (str, optional): Bearer token
+            payload (dict, optional): JSON body, form fields if `form`, or query params for GET requests
+            team_id (str, optional): Team the request is made for, used for rate limiting
+            channel (str, optional): Channel the request targets, defaults to payload["channel"]
+            http_method (str): GET or POST
+            form (bool): Send the payload form-encoded
+
+        Returns:
+            Dict[str, Any]: Slack response, {"ok": False, "error": ...} if it could not be sent
+        """
+        payload = payload or {}
+        if channel is None:
+            channel = payload.get("channel")
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        kwargs: Dict[str, Any] = {"headers": headers}
+        if http_method == "GET":
+            kwargs["params"] = payload
+        elif form:
+            kwargs["data"] = payload
+        else:
+            kwargs["json"] = payload
+        return await self._dispatch((team_id, method, channel), http_method, f"{SLACK_API_URL}/{method}", kwargs)
+
+    async def post_response_url(self, response_url: str, payload: Dict[str, Any], team_id: Optional[str] = None) -> Dict[str, Any]:
+        """Post to a slash command response_url, which answers with plain text instead of JSON"""
+        return await self._dispatch((team_id, "response_url", response_url), "POST", response_url, {"json": payload})
+
+    async def _dispatch(self, key: tuple, http_method: str, url: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        method = key[1]
+        if self.pending >= self.max_pending:
+            self.metrics["rejected"] += 1
+            logger.warning(f"Slack dispatcher queue full, dropping {method} request")
+            return {"ok": False, "error": "dispatcher_queue_full"}
+
+        self.pending += 1
+        try:
+            bucket = self._bucket(key)
+            attempt = 0
+            while True:
+                await bucket.acquire()
+                self.metrics["requests"] += 1
+                self.metrics[f"requests.{method}"] += 1
+                delay = 0.0
+                try:
+                    status, retry_after, data = await self._send(http_method, url, kwargs)
+                    error = data.get("error")
+                    if status == 429 or error == "ratelimited":
+                        # Every request to this bucket waits, not only the retry
+                        self.metrics["rate_limited"] += 1
+                        bucket.pause(retry_after or 1)
+                    elif status >= 500 or (not data.get("ok") and error in RETRYABLE_ERRORS):
+                        delay = min(2 ** attempt, 30)
+                    else:
+                        if not data.get("ok"):
+                            self.metrics["errors"] += 1
+                        return data
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    data = {"ok": False, "error": str(e) or type(e).__name__}
+                    delay = min(2 ** attempt, 30)
+
+                if attempt >= self.max_retries:
+                    self.metrics["failed"] += 1
+                    logger.warning(f"Giving up on Slack {method} after {attempt + 1} attempts: {data.get('error')}")
+                    return data
+                attempt += 1
+                self.metrics["retries"] += 1
+                await asyncio.sleep(delay)
+        finally:
+            self.pending -= 1
+
+    async def _send(self, http_method: str, url: str, kwargs: Dict[str, Any]) -> Tuple[int, Optional[float], Dict[str, Any]]:
+        session = get_session("slack")
+        async with session.request(http_method, url, **kwargs) as response:
+            try:
+                data = await response.json(content_type=None)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                # response_url and error pages answer with plain text
+                text = await response.text()
+                data = {"ok": True} if response.status == 200 else {"ok": False, "error": text or str(response.status)}
+            try:
+                retry_after = float(response.headers.get("Retry-After", ""))
+            except ValueError:
+                retry_after = None
+            return response.status, retry_after, data
+
+
+slack_dispatcher = SlackDispatcher()
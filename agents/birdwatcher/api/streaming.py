@@ -0,0 +1,102 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Slack rejects long messages, keep the tail of the partial answer while streaming
+MAX_STREAMED_CHARS = 3500
+
+
+class StreamingMessage:
+    """
+    Streams the progress of an agent run into an already posted Slack message.
+
+    Partial content and tool steps are rendered into the message, and edits are
+    throttled to one every `interval` seconds since chat.update is rate limited.
+    Intermediate edits are best effort, only the final one is reported.
+    """
+
+    def __init__(self, update: Callable[[str], Awaitable[bool]], interval: Optional[float] = None):
+        """
+        Initialize the stream.
+
+        Args:
+            update (Callable): Coroutine function editing the message with the given text
+            interval (float, optional): Minimum seconds between edits. Defaults to SLACK_STREAM_UPDATE_INTERVAL or 1.5
+        """
+        self.update = update
+        self.interval = interval if interval is not None else float(os.getenv("SLACK_STREAM_UPDATE_INTERVAL", 1.5))
+        self.content = ""
+        self.steps: List[str] = []
+        self.updates = 0
+        self._last_update = 0.0
+        self._rendered = None
+        self._pending: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def add_content(self, delta: str):
+        self.content += delta
+        self._schedule()
+
+    def tool_started(self, tool_name: str):
+        self.steps.append(f"⏳ Running `{tool_name}`")
+        self._schedule()
+
+    def tool_completed(self, tool_name: str, error: bool = False):
+        status = "❌" if error else "✅"
+        for i in range(len(self.steps) - 1, -1, -1):
+            if self.steps[i] == f"⏳ Running `{tool_name}`":
+                self.steps[i] = f"{status} `{tool_name}`"
+                break
+        self._schedule()
+
+    def render(self) -> str:
+        # Only the latest steps are useful while waiting
+        lines = self.steps[-5:]
+        content = self.content.strip()
+        if len(content) > MAX_STREAMED_CHARS:
+            content = "…" + content[-MAX_STREAMED_CHARS:]
+        if content:
+            lines = lines + ["", content]
+        return "\n".join(lines) or "⏳ Working on it…"
+
+    def _schedule(self):
+        if self._pending is None or self._pending.done():
+            delay = max(0.0, self._last_update + self.interval - time.monotonic())
+            self._pending = asyncio.create_task(self._flush_after(delay))
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            await self._push(self.render())
+        except Exception as e:
+            logger.warning(f"Could not stream progress to Slack: {e}")
+
+    async def _push(self, text: str) -> bool:
+        async with self._lock:
+            if text == self._rendered:
+                return True
+            ok = await self.update(text)
+            self._last_update = time.monotonic()
+            if ok:
+                self._rendered = text
+                self.updates += 1
+            return ok
+
+    async def finish(self, text: str) -> bool:
+        """
+        Replace the message with the final answer, cancelling any pending edit.
+
+        Args:
+            text (str): Final message text
+
+        Returns:
+            bool: True if the message was updated
+        """
+        if self._pending and not self._pending.done():
+            self._pending.cancel()
+            await asyncio.gather(self._pending, return_exceptions=True)
+        return await self._push(text)
@@ -0,0 +1,144 @@
+import re
+from collections import deque
+from typing import Iterable, List
+
+from .thinking_messages import THINKING_MESSAGES
+
+_NON_WORD = re.compile(r'[^\w\s]')
+
+# Separates messages in the suffix automaton, normalized text never contains it
+_SEPARATOR = "\x00"
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip everything but word characters and whitespace, e.g. emojis"""
+    return _NON_WORD.sub('', text.lower())
+
+
+class _PatternAutomaton:
+    """Aho-Corasick automaton answering whether any pattern occurs in a text"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._match: List[bool] = [False]
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._match.append(False)
+                state = next_state
+            self._match[state] = True
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fallback = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fallback if fallback != next_state else 0
+                self._match[next_state] = self._match[next_state] or self._match[self._fail[next_state]]
+
+    def search(self, text: str) -> bool:
+        goto, fail, match = self._goto, self._fail, self._match
+        state = 0
+        if match[0]:
+            return True
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if match[state]:
+                return True
+        return False
+
+
+class _SubstringAutomaton:
+    """Suffix automaton answering whether a text is a substring of any of the given strings"""
+
+    def __init__(self, strings: Iterable[str]):
+        self._next: List[dict] = [{}]
+        self._link: List[int] = [-1]
+        self._length: List[int] = [0]
+        last = 0
+        for char in _SEPARATOR.join(strings):
+            last = self._extend(last, char)
+
+    def _extend(self, last: int, char: str) -> int:
+        nxt, link, length = self._next, self._link, self._length
+        current = len(nxt)
+        nxt.append({})
+        length.append(length[last] + 1)
+        link.append(0)
+        state = last
+        while state != -1 and char not in nxt[state]:
+            nxt[state][char] = current
+            state = link[state]
+        if state != -1:
+            target = nxt[state][char]
+            if length[state] + 1 == length[target]:
+                link[current] = target
+            else:
+                clone = len(nxt)
+                nxt.append(dict(nxt[target]))
+                length.append(length[state] + 1)
+                link.append(link[target])
+                while state != -1 and nxt[state].get(char) == target:
+                    nxt[state][char] = clone
+                    state = link[state]
+                link[target] = clone
+                link[current] = clone
+        return current
+
+    def contains(self, text: str) -> bool:
+        nxt = self._next
+        state = 0
+        for char in text:
+            state = nxt[state].get(char)
+            if state is None:
+                return False
+        return True
+
+
+class ThinkingMessageMatcher:
+    """
+    Detects the bot's thinking messages in Slack threads.
+
+    A message matches when, once normalized, it contains one of the thinking
+    messages or is contained in one of them, e.g. a truncated copy. Both checks
+    run over automata built once from the corpus, so each call is linear in the
+    length of the message instead of scanning every thinking message.
+    """
+
+    def __init__(self, messages: Iterable[str], extra_patterns: Iterable[str] = ()):
+        """
+        Build the matcher.
+
+        Args:
+            messages (Iterable[str]): Thinking messages, matched in both directions
+            extra_patterns (Iterable[str]): Phrases that match when found anywhere in a message
+        """
+        corpus = [normalize(message) for message in messages]
+        self._patterns = _PatternAutomaton(corpus + [normalize(p) for p in extra_patterns])
+        self._corpus = _SubstringAutomaton(corpus)
+
+    def matches(self, text: str) -> bool:
+        if not text:
+            return False
+        clean_text = normalize(text)
+        return self._patterns.search(clean_text) or self._corpus.contains(clean_text)
+
+
+# Older placeholder messages are still matched so existing threads are handled
+thinking_matcher = ThinkingMessageMatcher(
+    THINKING_MESSAGES,
+    extra_patterns=["analyzing your request", "processing your request"],
+)
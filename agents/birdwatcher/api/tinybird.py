@@ -1,13 +1,15 @@
 import os
 import json
 import requests
-import aiohttp
 import asyncio
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Union
 from datetime import datetime
 import logging
 from cryptography.fernet import Fernet
 from base64 import b64encode, b64decode
+from .http import get_session, close_sessions
+from .event_batcher import get_event_batcher
+from .cache import TTLCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -91,7 +93,25 @@ class TinybirdConfig:
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
+        # Channel configurations and missions, refreshed in the background once stale
+        self._cache = TTLCache(
+            ttl=float(os.getenv("TINYBIRD_CACHE_TTL", 60)),
+            stale_ttl=float(os.getenv("TINYBIRD_CACHE_STALE_TTL", 600)),
+            cache_none=True,
+        )
+        # Decrypted Slack OAuth tokens per team
+        self._tokens_cache = TTLCache(ttl=float(os.getenv("SLACK_TOKENS_CACHE_TTL", 300)))
+        self._bundle_endpoint_available = True
+        # Rows for the Events API, batched with every other config of the workspace
+        self.events = get_event_batcher(self.host, token)
         
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hits and misses of the channel config and Slack token caches, keyed by cache name"""
+        return {
+            "tinybird_config": {"hits": self._cache.hits, "misses": self._cache.misses},
+            "slack_tokens": {"hits": self._tokens_cache.hits, "misses": self._tokens_cache.misses},
+        }
+
     def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None, data: Optional[Dict] = None) -> Dict:
         """
         Make a request to Tinybird API.
@@ -110,116 +130,167 @@ class TinybirdConfig:
 
     async def get_channel_config(self, channel_id: str, user_id: str = None) -> Optional[Dict]:
         """
-        Get the latest configuration for a specific channel from Tinybird.
+        Get the latest configuration for a specific channel, from the cache or Tinybird.
         
         Args:
             channel_id (str): Slack channel ID
+            user_id (str, optional): Slack user ID, needed for DMs
             
         Returns:
             Optional[Dict]: Channel configuration or None if not found
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.host}/v0/pipes/get_latest_user_token.json"
-                params = {
-                    "channel_id": channel_id,
-                }
-                if user_id:
-                    params["user_id"] = user_id
-                headers = {
-                    "Authorization": f"Bearer {self.token}"
-                }
-                
-                async with session.get(url, params=params, headers=headers) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if result.get("data") and len(result["data"]) > 0:
-                            config = result["data"][0]
-                            return config
-                        logger.info(f"No configuration found for channel {channel_id}")
-                        return None
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to get configuration. Status: {response.status}, Error: {error_text}")
-                        return None
-                        
+            return await self._cache.get_or_load(
+                ("config", channel_id, user_id),
+                lambda: self._fetch_channel_config(channel_id, user_id),
+            )
         except Exception as e:
             logger.error(f"Error getting channel configuration: {str(e)}")
             return None
+
+    async def _fetch_channel_config(self, channel_id: str, user_id: str = None) -> Optional[Dict]:
+        session = get_session("tinybird")
+        url = f"{self.host}/v0/pipes/get_latest_user_token.json"
+        params = {
+            "channel_id": channel_id,
+        }
+        if user_id:
+            params["user_id"] = user_id
+        headers = {
+            "Authorization": f"Bearer {self.token}"
+        }
+
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 200:
+                result = await response.json()
+                if result.get("data") and len(result["data"]) > 0:
+                    config = result["data"][0]
+                    return config
+                logger.info(f"No configuration found for channel {channel_id}")
+                return None
+            else:
+                error_text = await response.text()
+                raise Exception(f"Failed to get configuration. Status: {response.status}, Error: {error_text}")
         
-    async def get_missions(self, channel_id: str) -> Optional[Dict]:
+    async def get_missions(self, channel_id: str) -> Optional[List[Dict]]:
         """
-        Get the latest missions for a specific channel from Tinybird.
+        Get the latest missions for a specific channel, from the cache or Tinybird.
         
         Args:
             channel_id (str): Slack channel ID
             
         Returns:
-            Optional[Dict]: Channel missions or None if not found
+            Optional[List[Dict]]: Channel missions or None if not found
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.host}/v0/pipes/get_latest_missions.json"
-                params = {
-                    "channel_id": channel_id,
-                }
-                headers = {
-                    "Authorization": f"Bearer {self.token}"
-                }
-                
-                async with session.get(url, params=params, headers=headers) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if result.get("data") and len(result["data"]) > 0:
-                            return result["data"]
-                        logger.info(f"No missions found for channel {channel_id}")
-                        return None
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to get missions. Status: {response.status}, Error: {error_text}")
-                        return None
-                        
+            return await self._cache.get_or_load(
+                ("missions", channel_id),
+                lambda: self._fetch_missions(channel_id),
+            )
         except Exception as e:
             logger.error(f"Error getting channel missions: {str(e)}")
             return None
 
-    async def save_event(self, event_data: Dict, table_name: str) -> bool:
+    async def _fetch_missions(self, channel_id: str) -> Optional[List[Dict]]:
+        session = get_session("tinybird")
+        url = f"{self.host}/v0/pipes/get_latest_missions.json"
+        params = {
+            "channel_id": channel_id,
+        }
+        headers = {
+            "Authorization": f"Bearer {self.token}"
+        }
+
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 200:
+                result = await response.json()
+                if result.get("data") and len(result["data"]) > 0:
+                    return result["data"]
+                logger.info(f"No missions found for channel {channel_id}")
+                return None
+            else:
+                error_text = await response.text()
+                raise Exception(f"Failed to get missions. Status: {response.status}, Error: {error_text}")
+
+    def _update_cached_configs(self, channel_id: str, user_id: str, changes: Dict, create: bool = False):
         """
-        Save an event to Tinybird events API.
-        
+        Write saved fields through to the cached configurations of a channel.
+
         Args:
-            event_data (Dict): Event data to save
+            channel_id (str): Slack channel ID
+            user_id (str): Slack user ID who saved the change, used as key for DMs
+            changes (Dict): Fields to update
+            create (bool): Cache a new configuration if the channel has none cached
+        """
+        updated = False
+        for key, config in list(self._cache.items()):
+            if key[0] != "config" or key[1] != channel_id:
+                continue
+            if config is None and not create:
+                continue
+            self._cache.set(key, {**(config or {"channel_id": channel_id}), **changes})
+            updated = True
+        if create and not updated:
+            key = ("config", channel_id, user_id if channel_id.startswith('D') else None)
+            self._cache.set(key, {"channel_id": channel_id, **changes})
+
+    def _update_cached_missions(self, channel_id: str, mission: Dict):
+        """Write a saved mission through to the cached missions of a channel"""
+        key = ("missions", channel_id)
+        if key not in self._cache:
+            return
+        name = mission.get("name") or ""
+        missions = [m for m in (self._cache.get(key) or []) if (m.get("name") or "") != name]
+        if not mission.get("deleted"):
+            missions.append(mission)
+        self._cache.set(key, missions or None)
+
+    async def save_event(self, event_data: Union[Dict, List[Dict]], table_name: str, flush: bool = False) -> bool:
+        """
+        Save events to Tinybird events API.
+
+        Events are batched with the rest of the datasource's events and sent in the background,
+        unless `flush` is set, for writes that are read back right away.
+
+        Args:
+            event_data (Union[Dict, List[Dict]]): Event data to save, or several events
             table_name (str): Name of the Tinybird table to save to
-            
+            flush (bool): Send now, with the buffered events of the table, and wait until they are ingested
+
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if the events were buffered, or sent when flushing, False otherwise
         """
+        if not flush:
+            return self.buffer_event(event_data, table_name)
         try:
-            # Convert to NDJSON format
-            ndjson_data = json.dumps(event_data) + "\n"
-            
-            # Make async POST request to Tinybird events API
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.host}/v0/events"
-                params = {"name": table_name}
-                headers = {
-                    "Authorization": f"Bearer {self.token}",
-                    "Content-Type": "application/x-ndjson"
-                }
-                
-                async with session.post(url, params=params, headers=headers, data=ndjson_data) as response:
-                    if response.status == 202:
-                        logger.info(f"Successfully saved event to {table_name}")
-                        return True
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to save event. Status: {response.status}, Error: {error_text}")
-                        return False
-                        
+            events = event_data if isinstance(event_data, list) else [event_data]
+            return await self.events.send(table_name, events)
         except Exception as e:
             logger.error(f"Error saving event: {str(e)}")
             return False
 
+    def buffer_event(self, event_data: Union[Dict, List[Dict]], table_name: str) -> bool:
+        """
+        Buffer events for the Tinybird events API, without waiting.
+
+        Usable from synchronous code, the events are sent in the background with the
+        rest of the datasource's events.
+
+        Args:
+            event_data (Union[Dict, List[Dict]]): Event data to save, or several events
+            table_name (str): Name of the Tinybird table to save to
+
+        Returns:
+            bool: True if the events were buffered, False otherwise
+        """
+        try:
+            events = event_data if isinstance(event_data, list) else [event_data]
+            self.events.add(table_name, events)
+            return True
+        except Exception as e:
+            logger.error(f"Error buffering events for {table_name}: {str(e)}")
+            return False
+
     async def save_channel_config(self, channel_id: str, config: Dict) -> bool:
         """
         Save configuration for a specific channel to Tinybird events API.
@@ -241,7 +312,10 @@ class TinybirdConfig:
                 "updated_at": datetime.now().isoformat()
             }
             
-            return await self.save_event(event_data, "user_tokens")
+            success = await self.save_event(event_data, "user_tokens", flush=True)
+            if success:
+                self._update_cached_configs(channel_id, event_data["user_id"], event_data, create=True)
+            return success
                         
         except Exception as e:
             logger.error(f"Error saving channel configuration: {str(e)}")
@@ -264,10 +338,18 @@ class TinybirdConfig:
                 "user_id": config.get("updated_by", "unknown"),
                 "channel_id": channel_id,
                 "notification_types": config.get("notification_types", []),
+                "schedule": config.get("schedule", ""),
                 "updated_at": datetime.now().isoformat()
             }
             
-            return await self.save_event(event_data, "notification_configs")
+            success = await self.save_event(event_data, "notification_configs", flush=True)
+            if success:
+                self._update_cached_configs(
+                    channel_id,
+                    event_data["user_id"],
+                    {"notification_types": event_data["notification_types"], "schedule": event_data["schedule"]},
+                )
+            return success
                         
         except Exception as e:
             logger.error(f"Error saving notification configuration: {str(e)}")
@@ -302,7 +384,11 @@ class TinybirdConfig:
                 "updated_at": datetime.now().isoformat()
             }
             
-            return await self.save_event(event_data, "slack_oauth_tokens")
+            success = await self.save_event(event_data, "slack_oauth_tokens", flush=True)
+            if success:
+                # Tinybird may take a moment to return the new tokens
+                self._tokens_cache.set(team_id, {**event_data, "bot_token": bot_token})
+            return success
                         
         except Exception as e:
             logger.error(f"Error saving Slack OAuth tokens: {str(e)}")
@@ -310,7 +396,7 @@ class TinybirdConfig:
 
     async def get_slack_oauth_tokens(self, team_id: str) -> Optional[Dict]:
         """
-        Get the latest Slack OAuth tokens for a workspace from Tinybird.
+        Get the latest Slack OAuth tokens for a workspace, from the cache or Tinybird.
         
         Args:
             team_id (str): Slack team/workspace ID
@@ -319,40 +405,152 @@ class TinybirdConfig:
             Optional[Dict]: OAuth tokens or None if not found
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.host}/v0/pipes/get_latest_slack_oauth_tokens.json"
-                params = {
-                    "team_id": team_id,
-                }
-                headers = {
-                    "Authorization": f"Bearer {self.token}"
-                }
-                
-                async with session.get(url, params=params, headers=headers) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if result.get("data") and len(result["data"]) > 0:
-                            tokens = result["data"][0]
-                            # Decrypt the bot token
-                            if tokens.get("bot_token"):
-                                decrypted_token = decrypt_token(tokens["bot_token"])
-                                if decrypted_token:
-                                    tokens["bot_token"] = decrypted_token
-                                else:
-                                    logger.error("Failed to decrypt bot token")
-                                    return None
-                            return tokens
-                        logger.info(f"No OAuth tokens found for team {team_id}")
-                        return None
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to get OAuth tokens. Status: {response.status}, Error: {error_text}")
-                        return None
-                        
+            return await self._tokens_cache.get_or_load(
+                team_id, lambda: self._fetch_slack_oauth_tokens(team_id)
+            )
         except Exception as e:
             logger.error(f"Error getting Slack OAuth tokens: {str(e)}")
             return None
 
+    async def _fetch_slack_oauth_tokens(self, team_id: str) -> Optional[Dict]:
+        session = get_session("tinybird")
+        url = f"{self.host}/v0/pipes/get_latest_slack_oauth_tokens.json"
+        params = {
+            "team_id": team_id,
+        }
+        headers = {
+            "Authorization": f"Bearer {self.token}"
+        }
+
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 200:
+                result = await response.json()
+                if result.get("data") and len(result["data"]) > 0:
+                    return self._decrypt_slack_oauth_tokens(result["data"][0])
+                logger.info(f"No OAuth tokens found for team {team_id}")
+                return None
+            else:
+                error_text = await response.text()
+                raise Exception(f"Failed to get OAuth tokens. Status: {response.status}, Error: {error_text}")
+
+    def _decrypt_slack_oauth_tokens(self, tokens: Dict) -> Optional[Dict]:
+        """Decrypt the bot token of a slack_oauth_tokens row"""
+        if tokens.get("bot_token"):
+            decrypted_token = decrypt_token(tokens["bot_token"])
+            if decrypted_token:
+                tokens["bot_token"] = decrypted_token
+            else:
+                logger.error("Failed to decrypt bot token")
+                return None
+        return tokens
+
+    def invalidate_slack_oauth_tokens(self, team_id: str):
+        """Drop the cached OAuth tokens of a workspace, e.g. when the app is reinstalled"""
+        self._tokens_cache.invalidate(team_id)
+
+    async def get_channel_bundle(self, team_id: str, channel_id: str, user_id: str = None) -> Dict:
+        """
+        Get the configuration, missions and Slack OAuth tokens of a channel in one round trip.
+
+        Uses the cached values when all of them are cached. Otherwise queries the
+        get_channel_bundle endpoint, falling back to concurrent calls to the individual
+        endpoints if it is not deployed.
+
+        Args:
+            team_id (str): Slack team/workspace ID
+            channel_id (str): Slack channel ID
+            user_id (str, optional): Slack user ID, only used for DMs
+
+        Returns:
+            Dict: 'config', 'missions' and 'slack_tokens' of the channel
+        """
+        # Regular channels share one configuration, DMs have one per user
+        config_user_id = user_id if channel_id.startswith('D') else None
+        config_key = ("config", channel_id, config_user_id)
+        missions_key = ("missions", channel_id)
+
+        cached = config_key in self._cache and missions_key in self._cache
+        if team_id:
+            cached = cached and team_id in self._tokens_cache
+
+        if not cached and self._bundle_endpoint_available:
+            try:
+                bundle = await self._fetch_channel_bundle(team_id, channel_id, config_user_id)
+                self._cache.set(config_key, bundle["config"])
+                self._cache.set(missions_key, bundle["missions"] or None)
+                if team_id:
+                    self._tokens_cache.set(team_id, bundle["slack_tokens"])
+                return bundle
+            except Exception as e:
+                logger.error(f"Error getting channel bundle, falling back to individual endpoints: {str(e)}")
+
+        config, missions, slack_tokens = await asyncio.gather(
+            self.get_channel_config(channel_id, config_user_id),
+            self.get_missions(channel_id),
+            self.get_slack_oauth_tokens(team_id) if team_id else asyncio.sleep(0),
+        )
+        return {
+            "config": config,
+            "missions": missions or [],
+            "slack_tokens": slack_tokens,
+        }
+
+    async def _fetch_channel_bundle(self, team_id: str, channel_id: str, user_id: str = None) -> Dict:
+        session = get_session("tinybird")
+        url = f"{self.host}/v0/pipes/get_channel_bundle.json"
+        params = {
+            "team_id": team_id or "",
+            "channel_id": channel_id,
+        }
+        if user_id:
+            params["user_id"] = user_id
+        headers = {
+            "Authorization": f"Bearer {self.token}"
+        }
+
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 404:
+                # Not deployed yet, stop trying until the next restart
+                self._bundle_endpoint_available = False
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"Failed to get channel bundle. Status: {response.status}, Error: {error_text}")
+            result = await response.json()
+
+        row = result["data"][0] if result.get("data") else {}
+
+        config = None
+        if row.get("channel_id"):
+            config = {
+                "user_id": row.get("user_id"),
+                "channel_id": row.get("channel_id"),
+                "token": row.get("token"),
+                "host": row.get("host"),
+                "updated_at": row.get("updated_at"),
+                "notification_types": row.get("notification_types") or [],
+                "schedule": row.get("schedule") or "",
+            }
+
+        missions = [
+            {"channel_id": channel_id, "name": m.get("name") or None, "mission": m.get("mission", "")}
+            for m in row.get("missions") or []
+        ]
+
+        slack_tokens = None
+        if row.get("bot_token"):
+            slack_tokens = self._decrypt_slack_oauth_tokens({
+                "team_id": team_id,
+                "bot_token": row.get("bot_token"),
+                "bot_user_id": row.get("bot_user_id"),
+                "authed_user_id": row.get("authed_user_id"),
+            })
+
+        return {
+            "config": config,
+            "missions": missions,
+            "slack_tokens": slack_tokens,
+        }
+
     async def save_mission(self, channel_id: str, config: Dict) -> bool:
         """
         Save a mission for a specific channel to Tinybird events API.
@@ -371,11 +569,129 @@ class TinybirdConfig:
                 "updated_at": datetime.now().isoformat(),
                 "deleted": config.get("deleted", 0)
             }
-            return await self.save_event(event_data, "missions")
+            success = await self.save_event(event_data, "missions", flush=True)
+            if success:
+                self._update_cached_missions(channel_id, event_data)
+            return success
         except Exception as e:
             logger.error(f"Error saving mission: {str(e)}")
             return False
 
+    async def save_daily_aggregates(self, host: str, token_fingerprint: str, day: str, aggregates: List[Dict]) -> bool:
+        """
+        Save the daily aggregates of a monitored workspace, the baselines of the next summaries.
+
+        Args:
+            host (str): Tinybird host of the monitored workspace
+            token_fingerprint (str): Fingerprint of the token of the monitored workspace
+            day (str): Day the aggregates belong to, as YYYY-MM-DD
+            aggregates (List[Dict]): Rows with workspace_id, workspace_name, resource_type, resource_name, metric and value
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not aggregates:
+            return True
+        updated_at = datetime.now().isoformat()
+        events = [
+            {
+                "host": host,
+                "token_fingerprint": token_fingerprint,
+                "day": day,
+                "updated_at": updated_at,
+                **aggregate,
+            }
+            for aggregate in aggregates
+        ]
+        return await self.save_event(events, "daily_baselines")
+
+    async def get_daily_baselines(self, host: str, token_fingerprint: str, day: str, days: int = 7) -> List[Dict]:
+        """
+        Get the average daily aggregates of a monitored workspace over the days before a given day.
+
+        Args:
+            host (str): Tinybird host of the monitored workspace
+            token_fingerprint (str): Fingerprint of the token of the monitored workspace
+            day (str): Day being summarized, as YYYY-MM-DD
+            days (int): Number of previous days in the baseline
+
+        Returns:
+            List[Dict]: One row per resource metric with its baseline and the number of days it's based on
+        """
+        session = get_session("tinybird")
+        url = f"{self.host}/v0/pipes/get_daily_baselines.json"
+        params = {
+            "host": host,
+            "token_fingerprint": token_fingerprint,
+            "day": day,
+            "days": days,
+        }
+        headers = {
+            "Authorization": f"Bearer {self.token}"
+        }
+
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 200:
+                result = await response.json()
+                return result.get("data", [])
+            error_text = await response.text()
+            raise Exception(f"Failed to get daily baselines. Status: {response.status}, Error: {error_text}")
+
+    async def save_notification_delivery(self, channel_ids: List[str], notification_type: str, fingerprint: str, findings: List[Dict]) -> bool:
+        """
+        Save the findings of a notification delivered to some channels.
+
+        Args:
+            channel_ids (List[str]): Slack channel IDs the notification was posted to
+            notification_type (str): Notification type, e.g. cpu_spikes
+            fingerprint (str): Fingerprint of the findings
+            findings (List[Dict]): Findings of the notification
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        delivered_at = datetime.now().isoformat()
+        findings_json = json.dumps(findings)
+        events = [
+            {
+                "channel_id": channel_id,
+                "notification_type": notification_type,
+                "fingerprint": fingerprint,
+                "findings": findings_json,
+                "delivered_at": delivered_at,
+            }
+            for channel_id in channel_ids
+        ]
+        return await self.save_event(events, "notification_deliveries")
+
+    async def get_last_notification_fingerprints(self, channel_ids: List[str], notification_type: str) -> Dict[str, str]:
+        """
+        Get the fingerprint of the last notification of a type delivered to each channel.
+
+        Args:
+            channel_ids (List[str]): Slack channel IDs
+            notification_type (str): Notification type, e.g. cpu_spikes
+
+        Returns:
+            Dict[str, str]: Fingerprint per channel, channels without deliveries are missing
+        """
+        session = get_session("tinybird")
+        url = f"{self.host}/v0/pipes/get_last_notification_deliveries.json"
+        params = {
+            "channel_ids": ",".join(channel_ids),
+            "notification_type": notification_type,
+        }
+        headers = {
+            "Authorization": f"Bearer {self.token}"
+        }
+
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 200:
+                result = await response.json()
+                return {row["channel_id"]: row["fingerprint"] for row in result.get("data", [])}
+            error_text = await response.text()
+            raise Exception(f"Failed to get notification deliveries. Status: {response.status}, Error: {error_text}")
+
 def create_tinybird_config(host: str = "https://api.europe-west2.gcp.tinybird.co", token: str = None) -> TinybirdConfig:
     """
     Create a TinybirdConfig instance.
@@ -434,6 +750,8 @@ if __name__ == '__main__':
             
         except Exception as e:
             logger.error(f"Error in example operations: {str(e)}")
+        finally:
+            await close_sessions()
 
     # Run the async main function
     asyncio.run(main()) 
\ No newline at end of file
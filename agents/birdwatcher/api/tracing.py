@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from .http import get_session
+from .metrics import phase_duration
+
+logger = logging.getLogger(__name__)
+
+# Comma separated exporters: jsonl (TRACING_FILE), otlp (OTLP/HTTP JSON collector) and log (one line breakdown)
+TRACING_EXPORTERS = {name.strip() for name in os.getenv("TRACING_EXPORTERS", "").split(",") if name.strip()}
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+OTLP_TRACES_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT") or (
+    os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/") + "/v1/traces"
+)
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "birdwatcher")
+
+
+class Span:
+    """A timed phase of a trace, with its parent and attributes"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: Optional["Trace"], name: str, parent_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        if trace is not None:
+            trace.spans.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[str] = None):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if error:
+                self.error = error
+            phase_duration.observe((self.end_ns - self.start_ns) / 1e9, phase=self.name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id if self.trace else None,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """The spans of one request, correlated by a key such as the Slack message ID"""
+
+    def __init__(self, key: str):
+        self.key = key
+        # Deterministic so every export of the same message shares the trace ID
+        self.trace_id = hashlib.sha256(key.encode()).hexdigest()[:32]
+        self.spans: List[Span] = []
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("birdwatcher_span", default=None)
+_export_tasks = set()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_span(name: str, **attributes) -> Span:
+    """
+    Start a span under the current one without making it current, for phases that
+    begin and end in different places, e.g. tool calls seen as stream events.
+    Call `end()` on it when done. Outside a trace the span is not recorded.
+    """
+    parent = _current_span.get()
+    if parent is None or parent.trace is None:
+        return Span(None, name, attributes=attributes)
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a child of the current span"""
+    current = start_span(name, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, key: str, **attributes):
+    """
+    Start a trace with a root span and export it when the block exits.
+
+    Args:
+        name (str): Name of the root span
+        key (str): Correlation key of the trace, e.g. the Slack message ID
+        **attributes: Attributes of the root span
+    """
+    if not TRACING_EXPORTERS:
+        yield Span(None, name, attributes=attributes)
+        return
+    trace = Trace(key)
+    root = Span(trace, name, attributes={"trace.key": key, **attributes})
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.end(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        root.end()
+        _current_span.reset(token)
+        export_trace(trace)
+
+
+def trace_model(model):
+    """Record a span for each call of an agno model, streamed or not"""
+    if "ainvoke" in vars(model):
+        return model
+    ainvoke, ainvoke_stream = model.ainvoke, model.ainvoke_stream
+
+    async def traced_ainvoke(*args, **kwargs):
+        with span("model.call", model=model.id, stream=False):
+            return await ainvoke(*args, **kwargs)
+
+    async def traced_ainvoke_stream(*args, **kwargs):
+        # Not made current, the generator is resumed from the consumer's context
+        call = start_span("model.call", model=model.id, stream=True)
+        error = None
+        try:
+            async for chunk in ainvoke_stream(*args, **kwargs):
+                yield chunk
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            call.end(error=error)
+
+    model.ainvoke = traced_ainvoke
+    model.ainvoke_stream = traced_ainvoke_stream
+    return model
+
+
+def export_trace(trace: Trace):
+    """Hand a finished trace to the configured exporters, in the background when there's an event loop"""
+    for span_ in trace.spans:
+        # Spans left open by an error still get exported
+        if span_.end_ns is None:
+            span_.end(error="unfinished")
+    if "log" in TRACING_EXPORTERS:
+        print(format_breakdown(trace))
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if "jsonl" in TRACING_EXPORTERS:
+        lines = "".join(json.dumps(span_.to_dict(), default=str) + "\n" for span_ in trace.spans)
+        if loop:
+            _track(loop.run_in_executor(None, _append_lines, lines))
+        else:
+            _append_lines(lines)
+    if "otlp" in TRACING_EXPORTERS and loop:
+        _track(asyncio.ensure_future(_post_otlp(trace)))
+
+
+def _track(future):
+    _export_tasks.add(future)
+    future.add_done_callback(_export_tasks.discard)
+
+
+def _append_lines(lines: str):
+    try:
+        with open(TRACING_FILE, "a") as f:
+            f.write(lines)
+    except OSError as e:
+        logger.warning(f"Could not write traces to {TRACING_FILE}: {e}")
+
+
+def format_breakdown(trace: Trace) -> str:
+    """One line with the total time of the trace and of each top level phase"""
+    root = trace.spans[0]
+    children = [s for s in trace.spans if s.parent_id == root.span_id]
+    phases = ", ".join(f"{s.name} {s.duration_ms:.0f}ms" + (" ❌" if s.error else "") for s in children)
+    return f"⏱️ {root.name} {trace.key}: {root.duration_ms:.0f}ms | {phases}"
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    """Build the OTLP/HTTP JSON payload of a trace"""
+    spans = []
+    for span_ in trace.spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": span_.span_id,
+            "name": span_.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span_.start_ns),
+            "endTimeUnixNano": str(span_.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span_.attributes.items() if v is not None],
+            "status": {"code": 2, "message": span_.error} if span_.error else {"code": 1},
+        }
+        if span_.parent_id:
+            otlp_span["parentSpanId"] = span_.parent_id
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "birdwatcher"}, "spans": spans}],
+        }]
+    }
+
+
+async def _post_otlp(trace: Trace):
+    try:
+        session = get_session("otlp")
+        async with session.post(OTLP_TRACES_ENDPOINT, json=to_otlp(trace)) as response:
+            if response.status >= 300:
+                logger.warning(f"OTLP collector rejected trace {trace.key}: {response.status} {await response.text()}")
+    except Exception as e:
+        logger.warning(f"Could not export trace {trace.key} to {OTLP_TRACES_ENDPOINT}: {e}")
+
+
+async def flush_traces(app=None):
+    """Wait for pending trace exports, usable as an aiohttp on_cleanup hook"""
+    if _export_tasks:
+        await asyncio.gather(*list(_export_tasks), return_exceptions=True)
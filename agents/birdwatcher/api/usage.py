@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .metrics import record_token_usage, track_agent_run
+from .tinybird import create_tinybird_config
+
+# USD per million input, output and cached input tokens, by model id prefix.
+# MODEL_PRICES takes a JSON object with the same shape to add or override models.
+MODEL_PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50, 0.075),
+    "gemini-2.5-pro": (1.25, 10.0, 0.31),
+    "claude-4-sonnet": (3.0, 15.0, 0.30),
+    "claude-sonnet-4": (3.0, 15.0, 0.30),
+    "claude-3-7-sonnet": (3.0, 15.0, 0.30),
+    "gpt-4.1": (2.0, 8.0, 0.50),
+    "gpt-4.1-mini": (0.40, 1.60, 0.10),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("MODEL_PRICES") or "{}").items()})
+
+
+def _total(metrics: Dict, key: str) -> int:
+    values = metrics.get(key) or []
+    return int(sum(values) if isinstance(values, list) else values)
+
+
+def summarize_run(run_response) -> Dict[str, int]:
+    """
+    Add up the usage of an agno run response, its metrics hold one value per model call.
+
+    Returns:
+        Dict[str, int]: input, output and cached tokens, model calls and tool calls
+    """
+    metrics = getattr(run_response, "metrics", None) or {}
+    return {
+        "input_tokens": _total(metrics, "input_tokens"),
+        "output_tokens": _total(metrics, "output_tokens"),
+        "cached_tokens": _total(metrics, "cached_tokens"),
+        "model_calls": len(metrics.get("input_tokens") or []),
+        "tool_calls": len(getattr(run_response, "tools", None) or []),
+    }
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+    """Cost in USD of the tokens of a run, 0 for models without a known price"""
+    prefixes = [prefix for prefix in MODEL_PRICES if (model or "").startswith(prefix)]
+    if not prefixes:
+        return 0.0
+    input_price, output_price, cached_price = MODEL_PRICES[max(prefixes, key=len)]
+    uncached = max(input_tokens - cached_tokens, 0)
+    return (uncached * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1e6
+
+
+def split_usage(usage: Dict, parts: int) -> List[Dict]:
+    """
+    Split the usage of a run evenly across the channels it answers, so the rows add up to the run.
+
+    Counts are split as integers, the first parts taking the remainder.
+    """
+    shares = [{} for _ in range(parts)]
+    for key, value in usage.items():
+        if isinstance(value, float):
+            for share in shares:
+                share[key] = value / parts
+            continue
+        quotient, remainder = divmod(value, parts)
+        for i, share in enumerate(shares):
+            share[key] = quotient + (1 if i < remainder else 0)
+    return shares
+
+
+class UsageRecorder:
+    """
+    Records the usage of agent runs in the agent_runs datasource.
+
+    Rows go to the birdwatcher workspace (TINYBIRD_BIRDWATCHER_TOKEN) through
+    `TinybirdConfig.buffer_event`, so they're shipped in batches and flushed by
+    `close_event_batchers` on shutdown. Without a token, usage is not recorded.
+    """
+
+    def __init__(self, tinybird_config=None):
+        self.tinybird_config = tinybird_config
+
+    def _get_config(self):
+        if self.tinybird_config is None:
+            token = os.getenv("TINYBIRD_BIRDWATCHER_TOKEN")
+            if token:
+                self.tinybird_config = create_tinybird_config(token=token)
+        return self.tinybird_config
+
+    def record(
+        self,
+        source: str,
+        model: str,
+        mission: Optional[str],
+        run_response,
+        duration: float,
+        status: str = "ok",
+        channel_id: Optional[str] = None,
+        channel_ids: Optional[List[str]] = None,
+        team_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ):
+        """
+        Record the usage of a finished run, with one row per channel it answers.
+
+        Args:
+            source (str): Where the run comes from: slack, notification or command
+            model (str): Model id
+            mission (str, optional): Mission name, None for custom missions
+            run_response: agno RunResponse of the run, None if it failed before one was created
+            duration (float): Wall time of the run in seconds
+            status (str): ok or error
+            channel_id (str, optional): Slack channel the run answers
+            channel_ids (List[str], optional): Channels a shared run answers, its usage is split across them
+            team_id (str, optional): Slack workspace
+            user_id (str, optional): Slack user who asked
+        """
+        config = self._get_config()
+        if config is None:
+            return
+        usage = {**summarize_run(run_response), "duration_ms": int(duration * 1000)}
+        usage["cost_usd"] = estimate_cost(model, usage["input_tokens"], usage["output_tokens"], usage["cached_tokens"])
+        row = {
+            "timestamp": datetime.utcnow().isoformat(timespec="milliseconds"),
+            "run_id": uuid.uuid4().hex,
+            "source": source,
+            "model": model or "",
+            "mission": mission or "custom",
+            "status": status,
+            "team_id": team_id or "",
+            "user_id": user_id or "",
+        }
+        channel_ids = channel_ids or [channel_id or ""]
+        config.buffer_event([
+            {**row, "channel_id": channel, **share}
+            for channel, share in zip(channel_ids, split_usage(usage, len(channel_ids)))
+        ], "agent_runs")
+
+
+usage_recorder = UsageRecorder()
+
+
+@contextmanager
+def track_run(agent, source: str, mission: Optional[str], **context):
+    """
+    Record the metrics and usage of an agent run, read from `agent.run_response` when it ends.
+
+    Args:
+        agent: agno Agent running inside the block
+        source (str): Where the run comes from: slack, notification or command
+        mission (str, optional): Mission name, None for custom missions
+        **context: channel_id or channel_ids, team_id and user_id of the run
+    """
+    model = agent.model.id
+    start = time.monotonic()
+    status = "ok"
+    try:
+        with track_agent_run(source, mission, model):
+            yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        run_response = agent.run_response
+        record_token_usage(model, run_response)
+        usage_recorder.record(source, model, mission, run_response, time.monotonic() - start, status=status, **context)
@@ -0,0 +1,15 @@
+import os
+import hashlib
+
+
+def mcp_server_url(tinybird_host=None, tinybird_api_key=None):
+    """Build the Tinybird MCP server URL for a workspace token and host, TINYBIRD_MCP_URL overrides the server"""
+    base_url = os.getenv("TINYBIRD_MCP_URL", "https://mcp.tinybird.co")
+    if not tinybird_host:
+        return f"{base_url}?token={tinybird_api_key}"
+    return f"{base_url}?token={tinybird_api_key}&host={tinybird_host}"
+
+
+def token_fingerprint(token: str) -> str:
+    """Short, non-reversible fingerprint of a token, safe to use as a key or in logs"""
+    return hashlib.sha256((token or "").encode()).hexdigest()[:16]
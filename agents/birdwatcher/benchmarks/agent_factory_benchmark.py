@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of agent construction, rebuilding every component per request
+versus binding per-request state on a reused AgentFactory
+
+No network calls are made: the MCP toolkit is never connected and the model
+clients are only instantiated.
+
+Usage:
+    python benchmarks/agent_factory_benchmark.py [--runs 200] [--model gpt-4.1]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from birdwatcher import AgentFactory
+
+
+def bench(create, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        create()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return sum(timings) / runs, timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent construction micro-benchmark")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--model", default=os.getenv("MODEL", "gpt-4.1"), help="Model id, sets MODEL")
+    parser.add_argument("--reasoning", action="store_true")
+    args = parser.parse_args()
+
+    os.environ["MODEL"] = args.model
+    # Clients are created but never used, any key will do
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ.setdefault("ANTHROPIC_API_KEY", "sk-benchmark")
+    os.environ.pop("PG_URL", None)
+
+    kwargs = dict(
+        mission="cpu_spikes",
+        tinybird_host="https://api.tinybird.co",
+        tinybird_api_key="p.benchmark",
+        reasoning=args.reasoning,
+        slack_token="xoxb-benchmark",
+    )
+
+    factory = AgentFactory()
+    runs = {
+        "per-request": lambda: AgentFactory().create_agent(instructions=["Say hi"], **kwargs),
+        "factory": lambda: factory.create_agent(instructions=["Say hi"], **kwargs),
+    }
+
+    print(f"{'mode':<12} {'mean':>10} {'p50':>10} {'p95':>10}")
+    for name, create in runs.items():
+        mean, p50, p95 = bench(create, args.runs)
+        print(f"{name:<12} {mean * 1e3:>7.2f} ms {p50 * 1e3:>7.2f} ms {p95 * 1e3:>7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
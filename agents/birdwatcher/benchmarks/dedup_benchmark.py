@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark comparing the in-memory and file-based dedup backends
+
+Usage:
+    python benchmarks/dedup_benchmark.py [--sizes 10000 100000] [--checks 200]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.dedup import FileDedupBackend, MemoryDedupBackend
+
+
+async def fill(backend, size):
+    if isinstance(backend, FileDedupBackend):
+        # Write the file directly, marking entries one by one would dominate the run
+        now = time.time()
+        with open(backend.path, 'w') as f:
+            f.writelines(f"C123_{i}.000_U123|{now}\n" for i in range(size))
+    else:
+        for i in range(size):
+            await backend.mark(f"C123_{i}.000_U123")
+
+
+async def bench(backend, size, checks):
+    await fill(backend, size)
+    start = time.perf_counter()
+    for i in range(checks):
+        await backend.check_and_mark(f"C456_{i}.000_U456")
+    elapsed = time.perf_counter() - start
+    return elapsed / checks
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Dedup backend micro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--checks", type=int, default=200, help="check_and_mark calls per run")
+    args = parser.parse_args()
+
+    print(f"{'backend':<10} {'entries':>10} {'per event':>14} {'events/sec':>14}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            backends = {
+                "file": FileDedupBackend(path=os.path.join(tmp, "processed.txt")),
+                "memory": MemoryDedupBackend(),
+            }
+            for name, backend in backends.items():
+                per_event = await bench(backend, size, args.checks)
+                print(f"{name:<10} {size:>10} {per_event * 1e6:>11.1f} µs {1 / per_event:>14.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the Slack app, fully offline
+
+Starts the aiohttp app of api/slack.py against local fakes of the Slack Web API,
+Tinybird, the Tinybird MCP server and an OpenAI compatible model (see fake_services.py),
+replays Slack events at the given rates and reports, per rate:
+
+- ack: time until the app answers the event POST
+- e2e: time from the POST until the answer reaches the fake Slack
+- events/sec: answered events over the time from the first POST to the last answer
+
+Traces are JSON lines with the seconds since the start of the trace and the body of
+the Slack event_callback, e.g. as logged by the server:
+
+    {"offset": 0.25, "body": {"type": "event_callback", "team_id": "T1", "event": {...}}}
+
+Without --trace, mentions spread over --channels channels are generated.
+
+Usage:
+    python benchmarks/e2e_benchmark.py [--events 50] [--rates 5 20] [--model-delay 0.5] [--tool-calls 1]
+    python benchmarks/e2e_benchmark.py --trace benchmarks/traces/slack_mentions.jsonl --speed 2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import contextlib
+
+import aiohttp
+from aiohttp import web
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_services import FakeMCP, FakeModel, FakeSlack, FakeTinybird
+
+BOT_USER_ID = "UBIRDWATCHER"
+TEAM_ID = "TBENCHMARK"
+
+
+def generate_trace(events, channels):
+    """Mentions of the bot from different users, one channel after the other"""
+    trace = []
+    for i in range(events):
+        trace.append({"offset": 0.0, "body": {
+            "type": "event_callback",
+            "team_id": TEAM_ID,
+            "event": {
+                "type": "app_mention",
+                "user": f"U{i % 97:08d}",
+                "text": f"<@{BOT_USER_ID}> which pipes had the most errors in the last hour? #{i}",
+                "channel": f"C{i % channels:08d}",
+                "ts": f"1700000000.{i:06d}",
+            },
+        }})
+    return trace
+
+
+def load_trace(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def schedule(trace, run, rate=None, speed=1.0):
+    """
+    Copy the trace for a run: offsets at a fixed `rate` or the recorded ones sped up,
+    and timestamps moved so events aren't dropped as duplicates of a previous run.
+    """
+    events = []
+    for i, entry in enumerate(trace):
+        body = json.loads(json.dumps(entry["body"]))
+        event = body["event"]
+        event["team_id"] = body.get("team_id")
+        for key in ("ts", "thread_ts"):
+            if event.get(key):
+                seconds, _, fraction = event[key].partition(".")
+                event[key] = f"{int(seconds) + run * 1_000_000}.{fraction}"
+        offset = i / rate if rate else entry.get("offset", 0.0) / speed
+        events.append((offset, body))
+    return events
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def send_event(http, url, slack, offset, body, start, timeout, retry=False):
+    event = body["event"]
+    await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+    # Retries of an event are deduplicated by the app, only their ack is measured
+    answered = None if retry else slack.expect(event["channel"], event.get("thread_ts") or event["ts"], event["user"])
+    sent = time.perf_counter()
+    async with http.post(f"{url}/api/slack", json=body) as response:
+        await response.read()
+        acked = time.perf_counter()
+        if response.status != 200:
+            if answered:
+                answered.cancel()
+            return acked - sent, None, sent, f"HTTP {response.status}"
+    if retry:
+        return acked - sent, None, sent, None
+    try:
+        done = await asyncio.wait_for(answered, timeout)
+    except asyncio.TimeoutError:
+        return acked - sent, None, sent, "timeout"
+    return acked - sent, done - sent, sent, None
+
+
+async def replay(url, slack, events, timeout):
+    start = time.perf_counter() + 0.1
+    seen = set()
+    retries = []
+    for _, body in events:
+        event = body["event"]
+        message_id = (event["channel"], event["ts"], event["user"])
+        retries.append(message_id in seen)
+        seen.add(message_id)
+    async with aiohttp.ClientSession() as http:
+        results = await asyncio.gather(*[
+            send_event(http, url, slack, offset, body, start, timeout, retry)
+            for (offset, body), retry in zip(events, retries)
+        ])
+    acks = [ack for ack, _, _, _ in results]
+    latencies = [e2e for _, e2e, _, _ in results if e2e is not None]
+    errors = [error for _, _, _, error in results if error]
+    ends = [sent + e2e for _, e2e, sent, _ in results if e2e is not None]
+    first = min(sent for _, _, sent, _ in results)
+    throughput = len(ends) / (max(ends) - first) if ends else 0.0
+    return acks, latencies, errors, sum(retries), throughput
+
+
+async def start_app(app):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end Slack app benchmark")
+    parser.add_argument("--trace", help="JSON lines trace to replay, generated when missing")
+    parser.add_argument("--events", type=int, default=50, help="Events of the generated trace")
+    parser.add_argument("--channels", type=int, default=10, help="Channels of the generated trace")
+    parser.add_argument("--rates", type=float, nargs="+", help="Events/sec to replay at. Defaults to 5 and 20, or the trace offsets")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speed-up of the trace offsets when no rates are given")
+    parser.add_argument("--workers", type=int, default=4, help="SLACK_WORKERS")
+    parser.add_argument("--model-delay", type=float, default=0.5, help="Seconds to the first token of each completion")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed tokens")
+    parser.add_argument("--answer-tokens", type=int, default=50)
+    parser.add_argument("--tool-calls", type=int, default=1, help="MCP tool calls before answering")
+    parser.add_argument("--tool-delay", type=float, default=0.2, help="Seconds per MCP tool call")
+    parser.add_argument("--slack-delay", type=float, default=0.05, help="Seconds per Slack API request")
+    parser.add_argument("--tinybird-delay", type=float, default=0.05, help="Seconds per Tinybird API request")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for each answer")
+    parser.add_argument("--verbose", action="store_true", help="Keep the output of the app")
+    args = parser.parse_args()
+
+    # Keys and tokens only valid against the fakes
+    os.environ["ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+    os.environ["TINYBIRD_BIRDWATCHER_TOKEN"] = "p.benchmark"
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    os.environ["MODEL"] = "gpt-benchmark"
+    os.environ["SLACK_WORKERS"] = str(args.workers)
+    os.environ["DEDUP_BACKEND"] = "memory"
+    os.environ.pop("PG_URL", None)
+    os.environ.pop("RESEND_API_KEY", None)
+
+    from api.tinybird import create_tinybird_config, encrypt_token
+
+    slack = FakeSlack(args.slack_delay)
+    mcp = FakeMCP(args.tool_delay)
+    model = FakeModel(args.model_delay, args.token_delay, args.tool_calls, args.answer_tokens)
+    tinybird = FakeTinybird({}, args.tinybird_delay)
+    fakes = [slack, mcp, model, tinybird]
+    for fake in fakes:
+        await fake.start()
+    tinybird.bundle.update({
+        "token": encrypt_token("p.workspace"),
+        "host": tinybird.url,
+        "notification_types": [],
+        "missions": [],
+        "bot_token": encrypt_token("xoxb-benchmark"),
+        "bot_user_id": BOT_USER_ID,
+    })
+    os.environ["SLACK_API_URL"] = f"{slack.url}/api"
+    os.environ["TINYBIRD_MCP_URL"] = f"{mcp.url}/mcp"
+    os.environ["OPENAI_BASE_URL"] = f"{model.url}/v1"
+
+    # Imported once the environment points at the fakes, the app reads it at import time
+    from api import slack as slack_app
+    from api.usage import usage_recorder
+    slack_app.tinybird_config = create_tinybird_config(host=tinybird.url, token="p.benchmark")
+    usage_recorder.tinybird_config = slack_app.tinybird_config
+
+    trace = load_trace(args.trace) if args.trace else generate_trace(args.events, args.channels)
+    rates = args.rates or ([None] if args.trace else [5, 20])
+
+    output = contextlib.nullcontext()
+    if not args.verbose:
+        output = contextlib.redirect_stdout(open(os.devnull, "w"))
+        logging.disable(logging.INFO)
+    runner, url = await start_app(slack_app.app)
+    rows = []
+    try:
+        for run, rate in enumerate(rates):
+            with output:
+                acks, latencies, errors, retries, throughput = await replay(url, slack, schedule(trace, run, rate, args.speed), args.timeout)
+            rows.append((rate, len(acks), retries, len(latencies), len(errors), acks, latencies, throughput))
+    finally:
+        await runner.cleanup()
+        for fake in fakes:
+            await fake.stop()
+
+    print(f"{'rate':>8} {'events':>7} {'retries':>8} {'ok':>5} {'errors':>7} {'ack p50':>9} {'ack p99':>9} {'e2e p50':>9} {'e2e p99':>9} {'events/sec':>11}")
+    for rate, events, retries, ok, errors, acks, latencies, throughput in rows:
+        label = f"{rate:g}/s" if rate else "trace"
+        print(
+            f"{label:>8} {events:>7} {retries:>8} {ok:>5} {errors:>7}"
+            f" {percentile(acks, 0.5) * 1000:>7.1f}ms {percentile(acks, 0.99) * 1000:>7.1f}ms"
+            f" {percentile(latencies, 0.5):>8.2f}s {percentile(latencies, 0.99):>8.2f}s {throughput:>11.2f}"
+        )
+    print(f"\nmodel: {dict(model.requests)}")
+    print(f"mcp: {dict(mcp.requests)}")
+    print(f"slack: {dict(slack.requests)}")
+    print(f"tinybird: {dict(tinybird.requests)}")
+    print(f"tinybird rows: {dict(tinybird.events)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,297 @@
+"""
+Local stand-ins for the services the Slack app talks to, for offline benchmarks
+
+- FakeSlack: the Slack Web API (SLACK_API_URL), records when each thread gets its answer
+- FakeTinybird: the pipes and Events API used by TinybirdConfig
+- FakeMCP: a streamable-HTTP MCP server with a couple of Tinybird-like tools (TINYBIRD_MCP_URL)
+- FakeModel: an OpenAI compatible chat completions API (OPENAI_BASE_URL) answering from a script
+
+Every service takes a delay per request so latencies can be made realistic.
+"""
+import json
+import time
+import uuid
+import asyncio
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+
+class FakeService:
+    """An aiohttp app listening on a random local port"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = Counter()
+        self.app = web.Application()
+        self._runner = None
+        self.url = None
+
+    async def start(self) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _wait(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+
+class FakeSlack(FakeService):
+    """
+    Slack Web API answering every method with ok.
+
+    The final answer of the bot is the message, posted or edited, that mentions the
+    user who asked. `expect` returns a future resolved with the time it arrives, several
+    questions of a user in the same thread are answered in order.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(delay)
+        self._next_ts = 0
+        # ts of the messages posted by the bot -> (channel, thread_ts)
+        self._messages: Dict[str, Tuple[str, str]] = {}
+        # (channel, thread_ts, mention) -> futures of the unanswered questions
+        self._waiting: Dict[Tuple[str, str, str], List[asyncio.Future]] = defaultdict(list)
+        self.app.router.add_route("*", "/api/{method}", self.handle)
+
+    def expect(self, channel: str, thread_ts: str, user: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[(channel, thread_ts, f"<@{user}>")].append(future)
+        return future
+
+    def _check_answer(self, channel: str, thread_ts: Optional[str], text: str):
+        if not text.startswith("<@"):
+            return
+        key = (channel, thread_ts, text.split(">", 1)[0] + ">")
+        waiting = [future for future in self._waiting.get(key, []) if not future.done()]
+        if waiting:
+            waiting[0].set_result(time.perf_counter())
+            self._waiting[key] = waiting[1:]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.requests[method] += 1
+        if request.method == "POST":
+            if request.content_type == "application/json":
+                payload = await request.json()
+            else:
+                payload = dict(await request.post())
+        else:
+            payload = dict(request.query)
+        await self._wait()
+
+        if method == "chat.postMessage":
+            self._next_ts += 1
+            ts = f"1800000000.{self._next_ts:06d}"
+            channel = payload.get("channel", "")
+            self._messages[ts] = (channel, payload.get("thread_ts") or ts)
+            self._check_answer(channel, payload.get("thread_ts"), payload.get("text", ""))
+            return web.json_response({"ok": True, "channel": channel, "ts": ts})
+        if method == "chat.update":
+            channel, thread_ts = self._messages.get(payload.get("ts"), (payload.get("channel"), None))
+            self._check_answer(channel, thread_ts, payload.get("text", ""))
+            return web.json_response({"ok": True, "channel": channel, "ts": payload.get("ts")})
+        if method == "conversations.replies":
+            return web.json_response({"ok": True, "messages": [], "has_more": False})
+        return web.json_response({"ok": True})
+
+
+class FakeTinybird(FakeService):
+    """
+    Tinybird API serving one channel configuration for every channel.
+
+    Args:
+        bundle (dict): Row returned by get_channel_bundle, with encrypted tokens
+        delay (float): Seconds added to every request
+    """
+
+    def __init__(self, bundle: Dict, delay: float = 0.0):
+        super().__init__(delay)
+        self.bundle = bundle
+        self.events = Counter()
+        self.app.router.add_get("/v0/pipes/{pipe}.json", self.handle_pipe)
+        self.app.router.add_post("/v0/events", self.handle_events)
+
+    async def handle_pipe(self, request: web.Request) -> web.Response:
+        pipe = request.match_info["pipe"]
+        self.requests[pipe] += 1
+        await self._wait()
+        if pipe == "get_channel_bundle":
+            return web.json_response({"data": [{**self.bundle, "channel_id": request.query.get("channel_id")}]})
+        if pipe == "get_latest_slack_oauth_tokens":
+            return web.json_response({"data": [{
+                "team_id": request.query.get("team_id"),
+                "bot_token": self.bundle["bot_token"],
+                "bot_user_id": self.bundle["bot_user_id"],
+            }]})
+        if pipe == "get_latest_user_token":
+            return web.json_response({"data": [{**self.bundle, "channel_id": request.query.get("channel_id")}]})
+        return web.json_response({"data": []})
+
+    async def handle_events(self, request: web.Request) -> web.Response:
+        name = request.query.get("name", "")
+        self.requests["events"] += 1
+        body = await request.read()
+        await self._wait()
+        self.events[name] += body.count(b"\n")
+        return web.json_response({"successful_rows": body.count(b"\n"), "quarantined_rows": 0}, status=202)
+
+
+MCP_TOOLS = [
+    {
+        "name": "list_datasources",
+        "description": "List the datasources of the workspace",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "execute_query",
+        "description": "Run a SQL query against the workspace",
+        "inputSchema": {
+            "type": "object",
+            "properties": {"sql": {"type": "string", "description": "SQL query"}},
+            "required": ["sql"],
+        },
+    },
+]
+
+
+class FakeMCP(FakeService):
+    """Streamable-HTTP MCP server answering with JSON, `delay` applies to tool calls only"""
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(delay)
+        self.app.router.add_post("/mcp", self.handle)
+        # No server initiated messages, the client is fine without the GET stream
+        self.app.router.add_get("/mcp", self.handle_stream)
+        self.app.router.add_delete("/mcp", self.handle_close)
+
+    async def handle_stream(self, request: web.Request) -> web.Response:
+        return web.Response(status=405)
+
+    async def handle_close(self, request: web.Request) -> web.Response:
+        return web.Response(status=200)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        message = await request.json()
+        method = message.get("method")
+        self.requests[method] += 1
+        if "id" not in message:
+            # Notifications and responses get no answer
+            return web.Response(status=202)
+
+        headers = {}
+        if method == "initialize":
+            result = {
+                "protocolVersion": message["params"]["protocolVersion"],
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": {"name": "fake-tinybird-mcp", "version": "1.0.0"},
+            }
+            headers["mcp-session-id"] = uuid.uuid4().hex
+        elif method == "tools/list":
+            result = {"tools": MCP_TOOLS}
+        elif method == "tools/call":
+            await self._wait()
+            arguments = message["params"].get("arguments") or {}
+            text = json.dumps({"meta": [{"name": "count", "type": "UInt64"}], "data": [{"count": 42}], "query": arguments.get("sql")})
+            result = {"content": [{"type": "text", "text": text}], "isError": False}
+        else:
+            result = {}
+        return web.json_response({"jsonrpc": "2.0", "id": message["id"], "result": result}, headers=headers)
+
+
+class FakeModel(FakeService):
+    """
+    OpenAI compatible chat completions answering from a script.
+
+    Each user message gets `tool_calls` rounds of one execute_query call, then an answer
+    of `answer_tokens` words. The first token of every completion takes `delay` seconds
+    and every following one `token_delay`, streamed or not.
+    """
+
+    def __init__(self, delay: float = 0.5, token_delay: float = 0.01, tool_calls: int = 1, answer_tokens: int = 50):
+        super().__init__(delay)
+        self.token_delay = token_delay
+        self.tool_calls = tool_calls
+        self.answer_tokens = answer_tokens
+        self.app.router.add_post("/v1/chat/completions", self.handle)
+
+    def _next_step(self, body) -> Optional[Dict]:
+        """The tool call to make next, or None to answer"""
+        if not body.get("tools"):
+            # e.g. session summaries
+            return None
+        messages = body["messages"]
+        rounds = 0
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                break
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                rounds += 1
+        if rounds >= self.tool_calls:
+            return None
+        return {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": "execute_query", "arguments": json.dumps({"sql": f"SELECT count() FROM pipe_stats_rt -- {rounds}"})},
+        }
+
+    def _usage(self, body, completion_tokens: int) -> Dict:
+        prompt_tokens = len(json.dumps(body["messages"])) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        tool_call = self._next_step(body)
+        self.requests["tool_call" if tool_call else "answer"] += 1
+        words = [] if tool_call else [f"word{i} " for i in range(self.answer_tokens)]
+        completion_tokens = len(words) or 20
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": body["model"]}
+
+        await self._wait()
+        if not body.get("stream"):
+            await asyncio.sleep(self.token_delay * max(len(words) - 1, 0))
+            message = {"role": "assistant", "content": "".join(words) or None}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            return web.json_response({
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+                "usage": self._usage(body, completion_tokens),
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(choices, **extra):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": choices, **extra}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        if tool_call:
+            await send([{"index": 0, "delta": {"role": "assistant", "tool_calls": [{"index": 0, **tool_call}]}, "finish_reason": None}])
+            await send([{"index": 0, "delta": {}, "finish_reason": "tool_calls"}])
+        else:
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(self.token_delay)
+                await send([{"index": 0, "delta": {"content": word}, "finish_reason": None}])
+            await send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        await send([], usage=self._usage(body, completion_tokens))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
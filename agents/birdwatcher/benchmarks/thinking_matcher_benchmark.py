@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of thinking message detection over Slack threads, comparing the
+previous per-call regex scan with the precompiled ThinkingMessageMatcher
+
+Usage:
+    python benchmarks/thinking_matcher_benchmark.py [--threads 50 100 500] [--repeat 20]
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.thinking_matcher import thinking_matcher
+from api.thinking_messages import THINKING_MESSAGES
+
+SAMPLE_MESSAGES = [
+    "Can you check why the p95 latency of the api_requests endpoint went up yesterday?",
+    "The ingestion rate dropped by 40% at 14:00 UTC, mostly from the events datasource.",
+    "<@U123ABC> what are the top 10 pipes by processed bytes in the last 24 hours?",
+    "Here is the summary:\n• 3 endpoints with errors\n• CPU usage peaked at 87% 📈",
+]
+
+
+def regex_is_thinking_message(text):
+    """The per-call implementation the matcher replaces"""
+    if not text:
+        return False
+    clean_text = re.sub(r'[^\w\s]', '', text.lower())
+    for thinking_msg in THINKING_MESSAGES:
+        clean_thinking = re.sub(r'[^\w\s]', '', thinking_msg.lower())
+        if clean_thinking in clean_text or clean_text in clean_thinking:
+            return True
+    if "analyzing your request" in clean_text or "processing your request" in clean_text:
+        return True
+    return False
+
+
+def make_thread(size, rng):
+    # Roughly one thinking placeholder per user question, as in real threads
+    return [
+        rng.choice(THINKING_MESSAGES) if i % 3 == 1 else rng.choice(SAMPLE_MESSAGES)
+        for i in range(size)
+    ]
+
+
+def bench(check, thread, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in thread:
+            check(message)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thinking message matcher micro-benchmark")
+    parser.add_argument("--threads", type=int, nargs="+", default=[50, 100, 250, 500], help="Messages per thread")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'messages':>10} {'regex':>12} {'matcher':>12} {'speedup':>9}")
+    for size in args.threads:
+        thread = make_thread(size, rng)
+        assert [regex_is_thinking_message(m) for m in thread] == [thinking_matcher.matches(m) for m in thread]
+        regex = bench(regex_is_thinking_message, thread, args.repeat)
+        matcher = bench(thinking_matcher.matches, thread, args.repeat)
+        print(f"{size:>10} {regex * 1e3:>9.2f} ms {matcher * 1e3:>9.2f} ms {regex / matcher:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
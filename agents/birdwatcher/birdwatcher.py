@@ -10,9 +10,9 @@ from agno.tools.resend import ResendTools
 from agno.tools.slack import SlackTools
 
 import json
+import google.auth
 from agno.tools.reasoning import ReasoningTools
 from agno.tools.thinking import ThinkingTools
-import tempfile
 import argparse
 
 from prompts import *
@@ -20,10 +20,18 @@ from textwrap import dedent
 from agno.tools.mcp import MCPTools
 import os
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 import glob
+from copy import copy
+from contextlib import AsyncExitStack
 
 from dotenv import load_dotenv
+from api.tracing import trace_model
+from api.usage import track_run
+from api.event_batcher import close_event_batchers
+from api.http import close_sessions
+from api.workspaces import mcp_server_url
+from api.mcp_catalog import MCPClientParams
 
 MISSIONS = {}
 missions_dir = os.path.join(os.path.dirname(__file__), 'missions')
@@ -31,161 +39,327 @@ for path in glob.glob(os.path.join(missions_dir, '*.md')):
     name = os.path.splitext(os.path.basename(path))[0]
     MISSIONS[name] = path
 
-async def create_agno_agent(
-    role="Autonomous Data Analyst",
-    system_prompt=SYSTEM_PROMPT,
-    instructions=None,
-    mission=None,
-    markdown=True,
-    tinybird_host=None,
-    tinybird_api_key=None,
-    reasoning=False,
-    slack_token=None,
-):
-    use_storage = os.getenv("PG_URL")
-    if use_storage:
+def load_google_credentials():
+    """
+    Load Google credentials given inline as JSON in GOOGLE_APPLICATION_CREDENTIALS.
+
+    Credentials are kept in memory and handed to the Gemini client, so nothing is
+    written to disk. Returns None when the variable is unset or holds a file path,
+    which the Google client libraries already resolve on their own.
+    """
+    google_creds = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    if not google_creds:
+        return None
+    try:
+        creds_data = json.loads(google_creds)
+    except json.JSONDecodeError:
+        return None
+    credentials, _ = google.auth.load_credentials_from_dict(
+        creds_data, scopes=["https://www.googleapis.com/auth/cloud-platform"]
+    )
+    return credentials
+
+
+def load_missions():
+    """Read every mission file once, keyed by mission name"""
+    contents = {}
+    for name, path in MISSIONS.items():
+        with open(path, 'r') as f:
+            contents[name] = f.read()
+    return contents
+
+
+class AgentFactory:
+    """
+    Builds agents from components shared across requests.
+
+    Model clients, storage, mission files and the Resend toolkit are created once
+    and reused. Each agent only binds what changes per request: the Tinybird MCP
+    connection, the Slack token, the reasoning toolkits, the instructions and the
+    current date.
+    """
+
+    def __init__(self):
+        self.missions = load_missions()
+        self.google_credentials = load_google_credentials()
+        # Stateless toolkit, shared by every agent
+        self.resend_tools = ResendTools(from_email="onboarding@resend.dev") if os.getenv("RESEND_API_KEY") else None
+        self.storage = None
+        self.memory = None
         db_url = os.getenv("PG_URL")
-        memory = Memory(
-            model=Claude(id="claude-4-sonnet-20250514"),
-            db=PostgresMemoryDb(table_name="user_memories", db_url=db_url),
-        )
-        storage = PostgresStorage(table_name="bird_watcher_agent", db_url=db_url)
+        if db_url:
+            self.memory = Memory(
+                model=Claude(id="claude-4-sonnet-20250514"),
+                db=PostgresMemoryDb(table_name="user_memories", db_url=db_url),
+            )
+            self.storage = PostgresStorage(table_name="bird_watcher_agent", db_url=db_url)
+        self._models = {}
 
-    if not tinybird_host:
-        server_url = (
-            f"https://mcp.tinybird.co?token={tinybird_api_key}"
-        )
-    else:
-        server_url = (
-            f"https://mcp.tinybird.co?token={tinybird_api_key}&host={tinybird_host}"
-        )
+    def get_model(self, model_id=None):
+        """
+        Get a model for the given id, sharing the underlying API client.
 
-    mcp_tools = MCPTools(
-        transport="streamable-http", url=server_url, timeout_seconds=300
-    )
+        Agents keep per-run state in their model, so each call returns a shallow
+        copy of a cached prototype whose HTTP client has already been created.
+        """
+        model_id = model_id or os.getenv("MODEL", "gemini-2.5-flash")
+        prototype = self._models.get(model_id)
+        if prototype is None:
+            if "gemini" in model_id:
+                prototype = Gemini(
+                    id=model_id,
+                    vertexai=True,
+                    project_id=os.getenv("GOOGLE_CLOUD_PROJECT", ""),
+                    location=os.getenv("GOOGLE_CLOUD_LOCATION", ""),
+                    client_params={"credentials": self.google_credentials} if self.google_credentials else None,
+                )
+            elif "claude" in model_id:
+                prototype = Claude(id=model_id)
+            else:
+                prototype = OpenAIChat(id=model_id)
+            try:
+                if hasattr(prototype, "get_async_client"):
+                    prototype.get_async_client()
+                else:
+                    prototype.get_client()
+            except Exception as e:
+                print(f"Warning: could not create {model_id} client: {e}")
+            self._models[model_id] = prototype
+        return trace_model(copy(prototype))
 
-    google_creds = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-    credentials_file = None
+    def get_mission(self, mission):
+        """Return the instructions of a named mission, or the mission itself if it's custom text"""
+        return self.missions.get(mission, mission)
 
-    if google_creds:
-        try:
-            creds_data = json.loads(google_creds)
-            with tempfile.NamedTemporaryFile(
-                mode="w", suffix=".json", delete=False
-            ) as f:
-                json.dump(creds_data, f)
-                credentials_file = f.name
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_file
-        except json.JSONDecodeError:
-            pass
-
-    tools=[
-        mcp_tools,
-        SlackTools(token=slack_token or ""),
-    ]
-
-    resend_api_key = os.getenv("RESEND_API_KEY")
-    if resend_api_key:
-        tools.append(ResendTools(from_email="onboarding@resend.dev"))
-
-    if reasoning:
-        tools.append(ReasoningTools(add_instructions=True))
-        tools.append(ThinkingTools(add_instructions=True))
-
-    model = os.getenv("MODEL", "gemini-2.5-flash")
-    if "gemini" in model:
-        model = Gemini(
-            id=model,
-            vertexai=True,
-            project_id=os.getenv("GOOGLE_CLOUD_PROJECT", ""),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION", ""),
-        )
-    elif "claude" in model:
-        model = Claude(id=model)
-    else:
-        model = OpenAIChat(id=model)
-
-    if mission:
-        if mission in MISSIONS:
-            with open(MISSIONS[mission], 'r') as f:
-                mission_content = f.read()
+    def create_agent(
+        self,
+        role="Autonomous Data Analyst",
+        system_prompt=SYSTEM_PROMPT,
+        instructions=None,
+        mission=None,
+        markdown=True,
+        tinybird_host=None,
+        tinybird_api_key=None,
+        reasoning=False,
+        slack_token=None,
+        mcp_tools=None,
+        model=None,
+    ):
+        # Reuse an already connected MCPTools when given, e.g. borrowed from a pool
+        if mcp_tools is None:
+            mcp_tools = MCPTools(
+                transport="streamable-http",
+                server_params=MCPClientParams(
+                    url=mcp_server_url(tinybird_host, tinybird_api_key), timeout=timedelta(seconds=300)
+                ),
+                timeout_seconds=300,
+            )
+
+        tools=[
+            mcp_tools,
+            SlackTools(token=slack_token or ""),
+        ]
+
+        if self.resend_tools:
+            tools.append(self.resend_tools)
+
+        # Not shared: agents bind these toolkits' functions to themselves and keep their steps in session_state
+        if reasoning:
+            tools.append(ReasoningTools(add_instructions=True))
+            tools.append(ThinkingTools(add_instructions=True))
+
+        model = self.get_model(model)
+
+        if mission:
+            mission_content = self.get_mission(mission)
             if instructions is None:
                 instructions = [mission_content]
             elif isinstance(instructions, list):
                 instructions.append(mission_content)
             else:
                 instructions = [instructions, mission_content]
-        else:
-            if instructions is None:
-                instructions = [mission]
-            elif isinstance(instructions, list):
-                instructions.append(mission)
-            else:
-                instructions = [instructions, mission]
 
-    agent = Agent(
-        model=model,
+        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        agent = Agent(
+            model=model,
+            role=role,
+            name=role,
+            session_state={"current_date": current_date},
+            tools=tools,
+            reasoning=reasoning,
+            # memory=self.memory,
+            # enable_agentic_memory=True,
+            # enable_user_memories=True,
+            storage=self.storage,
+            add_history_to_messages=True,
+            num_history_runs=5,
+            markdown=markdown,
+            read_chat_history=False,
+            read_tool_call_history=False,
+            enable_session_summaries=True,
+            description=dedent(system_prompt).format(current_date=current_date),
+            instructions=instructions,
+            # disabled
+            search_previous_sessions_history=False,
+            num_history_sessions=2,
+            show_tool_calls=False,
+            debug_mode=True,
+            exponential_backoff=True,
+            retries=2
+        )
+
+        return agent, mcp_tools
+
+
+_agent_factory = None
+
+
+def get_agent_factory():
+    """Get the process-wide AgentFactory, created on first use so .env is already loaded"""
+    global _agent_factory
+    if _agent_factory is None:
+        _agent_factory = AgentFactory()
+    return _agent_factory
+
+
+async def create_agno_agent(
+    role="Autonomous Data Analyst",
+    system_prompt=SYSTEM_PROMPT,
+    instructions=None,
+    mission=None,
+    markdown=True,
+    tinybird_host=None,
+    tinybird_api_key=None,
+    reasoning=False,
+    slack_token=None,
+    mcp_tools=None,
+    model=None,
+):
+    return get_agent_factory().create_agent(
         role=role,
-        name=role,
-        session_state={"current_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")},
-        tools=tools,
-        reasoning=reasoning,
-        # memory=memory,
-        # enable_agentic_memory=True,
-        # enable_user_memories=True,
-        storage=storage if use_storage else None,
-        add_history_to_messages=True,
-        num_history_runs=5,
-        markdown=markdown,
-        read_chat_history=False,
-        read_tool_call_history=False,
-        enable_session_summaries=True,
-        description=dedent(system_prompt).format(current_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        system_prompt=system_prompt,
         instructions=instructions,
-        # disabled
-        search_previous_sessions_history=False,
-        num_history_sessions=2,
-        show_tool_calls=False,
-        debug_mode=True,
-        exponential_backoff=True,
-        retries=2
+        mission=mission,
+        markdown=markdown,
+        tinybird_host=tinybird_host,
+        tinybird_api_key=tinybird_api_key,
+        reasoning=reasoning,
+        slack_token=slack_token,
+        mcp_tools=mcp_tools,
+        model=model,
     )
 
-    return agent, mcp_tools, credentials_file
 
+async def run_single_command(
+    prompt,
+    user_id="alrocar",
+    instructions=None,
+    reasoning=False,
+    mission=None,
+    raise_errors=False,
+    tinybird_host=None,
+    tinybird_api_key=None,
+    model=None,
+    slack_token=None,
+    mcp_tools=None,
+    source="command",
+    channel_id=None,
+):
+    """
+    Run a single command and exit - useful for cron jobs.
+
+    Credentials are taken from the arguments and default to TINYBIRD_TOKEN, TINYBIRD_HOST,
+    MODEL and SLACK_TOKEN, so concurrent runs in the same process can target different
+    workspaces. An already connected `mcp_tools`, e.g. borrowed from an MCPSessionPool, is
+    used as is. With raise_errors, agent errors are re-raised after printing. The token
+    usage of the run is recorded under `source` and `channel_id`.
 
-async def run_single_command(prompt, user_id="alrocar", instructions=None, reasoning=False, mission=None):
-    """Run a single command and exit - useful for cron jobs"""
+    Returns the agno RunResponse of the run, or None if it failed and errors are not raised.
+    """
     load_dotenv()
-    tinybird_api_key = os.getenv("TINYBIRD_TOKEN")
+    tinybird_api_key = tinybird_api_key or os.getenv("TINYBIRD_TOKEN")
     if not tinybird_api_key:
         raise ValueError("TINYBIRD_TOKEN is not set")
-    tinybird_host = os.getenv("TINYBIRD_HOST")
-    memory_agent, mcp_tools, _ = await create_agno_agent(
+    tinybird_host = tinybird_host or os.getenv("TINYBIRD_HOST")
+    memory_agent, agent_mcp_tools = await create_agno_agent(
         system_prompt=SYSTEM_PROMPT,
         instructions=instructions,
         mission=mission,
         tinybird_host=tinybird_host,
         tinybird_api_key=tinybird_api_key,
         reasoning=reasoning,
+        slack_token=slack_token,
+        mcp_tools=mcp_tools,
+        model=model,
     )
 
-    async with mcp_tools:
+    async with AsyncExitStack() as stack:
+        if mcp_tools is None:
+            await stack.enter_async_context(agent_mcp_tools)
         try:
             print(f"📝 Prompt: {prompt}")
             print("-" * 50)
             
-            await memory_agent.aprint_response(
-                prompt,
-                user_id=user_id,
-                stream=True,
-                show_full_reasoning=True,
-                show_reasoning=True,
-                stream_intermediate_steps=True
-            )
+            with track_run(memory_agent, source, mission, channel_id=channel_id, user_id=user_id):
+                await memory_agent.aprint_response(
+                    prompt,
+                    user_id=user_id,
+                    stream=True,
+                    show_full_reasoning=True,
+                    show_reasoning=True,
+                    stream_intermediate_steps=True
+                )
+            return memory_agent.run_response
             
         except Exception as e:
             print(f"❌ Error: {e}")
+            if raise_errors:
+                raise
+
+
+async def run_agent(
+    prompt,
+    user_id="system",
+    instructions=None,
+    reasoning=False,
+    mission=None,
+    tinybird_host=None,
+    tinybird_api_key=None,
+    model=None,
+    slack_token=None,
+    mcp_tools=None,
+    source="command",
+    channel_ids=None,
+):
+    """
+    Run the agent on a prompt and return its final response instead of printing it.
+
+    Takes the same arguments as run_single_command, errors are raised to the caller.
+    `channel_ids` are the channels the response is posted to, its usage is split across them.
+    """
+    load_dotenv()
+    tinybird_api_key = tinybird_api_key or os.getenv("TINYBIRD_TOKEN")
+    if not tinybird_api_key:
+        raise ValueError("TINYBIRD_TOKEN is not set")
+    tinybird_host = tinybird_host or os.getenv("TINYBIRD_HOST")
+    agent, agent_mcp_tools = await create_agno_agent(
+        system_prompt=SYSTEM_PROMPT,
+        instructions=instructions,
+        mission=mission,
+        tinybird_host=tinybird_host,
+        tinybird_api_key=tinybird_api_key,
+        reasoning=reasoning,
+        slack_token=slack_token,
+        mcp_tools=mcp_tools,
+        model=model,
+    )
+
+    async with AsyncExitStack() as stack:
+        if mcp_tools is None:
+            await stack.enter_async_context(agent_mcp_tools)
+        with track_run(agent, source, mission, channel_ids=channel_ids, user_id=user_id):
+            result = await agent.arun(prompt, user_id=user_id, stream=False)
+        return str(result.content) if result and result.content else ""
 
 
 async def main():
@@ -200,13 +374,15 @@ async def main():
     # Single command mode
     if args.prompt:
         await run_single_command(args.prompt, args.user_id, mission=args.mission or "base")
+        await close_event_batchers()
+        await close_sessions()
         return
     
     # Interactive chat mode
     user_id = args.user_id
     tinybird_api_key = os.getenv("TINYBIRD_TOKEN")
     tinybird_host = os.getenv("TINYBIRD_HOST")
-    memory_agent, mcp_tools, _ = await create_agno_agent(
+    memory_agent, mcp_tools = await create_agno_agent(
         system_prompt=SYSTEM_PROMPT,
         # instructions=[dedent(ORGANIZATION_METRICS_PROMPT)] + [dedent(INVESTIGATION_TEMPLATES)],
         # mission="explore",
@@ -1,77 +1,390 @@
 import os
-import aiohttp
+import json
+import time
 import asyncio
-from api.tinybird import decrypt_token
+from api.tinybird import create_tinybird_config, decrypt_token
+from api.http import get_session, close_sessions
+from api.mcp_pool import MCPSessionPool
+from api.workspaces import token_fingerprint
+from api.slack_dispatcher import slack_dispatcher
+from api.cpu_spikes import find_cpu_spikes, describe_spikes
+from api.daily_summary import build_daily_summary_context
+from api.findings import cpu_spike_findings, daily_summary_findings, fingerprint_findings
+from api.event_batcher import close_event_batchers
 from dotenv import load_dotenv
-from birdwatcher import run_single_command
+from birdwatcher import run_agent, run_single_command
 
 load_dotenv()
 
+# Agent runs in parallel, overall and against the same Tinybird host
+NOTIFICATION_CONCURRENCY = int(os.getenv("NOTIFICATION_CONCURRENCY", 8))
+NOTIFICATION_CONCURRENCY_PER_HOST = int(os.getenv("NOTIFICATION_CONCURRENCY_PER_HOST", 4))
+NOTIFICATION_TIMEOUT_SECONDS = float(os.getenv("NOTIFICATION_TIMEOUT_SECONDS", 900))
+# What to do when the findings are the same as last time: skip posting, or collapse into a one line message
+NOTIFICATION_UNCHANGED_ACTION = os.getenv("NOTIFICATION_UNCHANGED_ACTION", "skip")
+
+UNCHANGED_MESSAGES = {
+    "cpu_spikes": "No new CPU spikes since the last report.",
+    "daily_summary": "No material changes in the organization metrics since the last summary.",
+    "default": "No material changes since the last report.",
+}
+
 async def get_notification_configs():
     """Get all notification configurations from Tinybird"""
     token = os.getenv('TINYBIRD_BIRDWATCHER_TOKEN')
     if not token:
         raise ValueError("TINYBIRD_BIRDWATCHER_TOKEN not set")
     host = "https://api.europe-west2.gcp.tinybird.co"
-    
+
     url = f"{host}/v0/pipes/get_latest_user_token.json"
     params = {"schedule": "true"}
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params, headers={"Authorization": f"Bearer {token}"}) as response:
-            if response.status != 200:
-                raise Exception(f"Failed to get configurations: {await response.text()}")
-            return await response.json()
-
-async def run_notification_check(config):
-    """Run notification check for a specific configuration"""
+
+    session = get_session("tinybird")
+    async with session.get(url, params=params, headers={"Authorization": f"Bearer {token}"}) as response:
+        if response.status != 200:
+            raise Exception(f"Failed to get configurations: {await response.text()}")
+        return await response.json()
+
+# Appended instead of the target channel when one run is posted to several channels
+SHARED_DELIVERY_INSTRUCTIONS = "Do not send any notification yourself. Reply only with the Slack message to send, it will be posted to several channels."
+
+def get_notification_prompt(notification_type, channel_id=None, precomputed=False):
+    """
+    Return the (prompt, mission) of a notification type, or None if it's unknown.
+
+    Without channel_id the agent replies with the message instead of sending it. With
+    precomputed the daily_summary metrics come in the instructions instead of being queried.
+    """
+    if notification_type == 'cpu_spikes':
+        delivery = f"notify to the slack channel with id: {channel_id}" if channel_id else SHARED_DELIVERY_INSTRUCTIONS
+        prompt = f"investigate cpu spikes in the last day. {delivery}"
+        return prompt, "cpu_spikes"
+    elif notification_type == 'daily_summary':
+        delivery = f"Notify to the slack channel with id: {channel_id}" if channel_id else SHARED_DELIVERY_INSTRUCTIONS
+        if precomputed:
+            prompt = f"""Build a metrics report to understand the organization health from the metrics of the last 24 hours in your instructions, compared with the previous days.
+            You MUST report workspace names, resource names, and quantitative metrics, with their change against the baseline.
+            Only query organization datasources to explain a notable change, e.g. the timeframe of an error increase.
+            {delivery}"""
+            return prompt, "daily_summary"
+        prompt = f"""Extract metrics from last 24 hours from these organization datasources: 
+                - organization.pipe_stats_rt
+                - organization.datasources_ops_log
+                - organization.jobs_log
+            Build a metrics report understand the organization health: you must at least report workspace names, resource names, timeframes and relevant metrics. 
+            Relevant metrics include: increased error rates, increased latency, increased number of jobs, increased number of bytes processed, increased number of requests.
+            You MUST report workspace names, resource names, and quantitative metrics during a given timeframe. 
+            {delivery}"""
+        return prompt, "daily_summary"
+    return None
+
+def build_notification_runs(config):
+    """Build one agent run per notification type of a configuration"""
     channel_id = config.get('channel_id')
     notification_types = config.get('notification_types', [])
     encrypted_token = config.get('token')
     tinybird_host = config.get('host')
     user_id = config.get('user_id', 'system')
-    
+
     if not all([channel_id, notification_types, encrypted_token, tinybird_host]):
         print(f"Skipping invalid configuration: {config}")
-        return
-        
+        return []
+
     # Decrypt the token
     tinybird_token = decrypt_token(encrypted_token)
     if not tinybird_token:
         print(f"Failed to decrypt token for channel {channel_id}")
-        return
-        
-    # Set environment variables for the script
-    os.environ['TINYBIRD_TOKEN'] = tinybird_token
-    os.environ['TINYBIRD_HOST'] = tinybird_host
-    
+        return []
+
+    runs = []
     for notification_type in notification_types:
-        if notification_type == 'cpu_spikes':
-            prompt = f"investigate cpu spikes in the last day. notify to the slack channel with id: {channel_id}"
-            mission = "cpu_spikes"
-        elif notification_type == 'daily_summary':
-            prompt = f"""Extract metrics from last 24 hours from these organization datasources: 
-                - organization.pipe_stats_rt
-                - organization.datasources_ops_log
-                - organization.jobs_log
-            Build a metrics report understand the organization health: you must at least report workspace names, resource names, timeframes and relevant metrics. 
-            Relevant metrics include: increased error rates, increased latency, increased number of jobs, increased number of bytes processed, increased number of requests.
-            You MUST report workspace names, resource names, and quantitative metrics during a given timeframe. 
-            Notify to the slack channel with id: {channel_id}"""
-            mission = "daily_summary"
-        else:
+        notification = get_notification_prompt(notification_type, channel_id)
+        if not notification:
             print(f"Unknown notification type: {notification_type}")
             continue
-            
+        prompt, mission = notification
+        runs.append({
+            "channel_id": channel_id,
+            "notification_type": notification_type,
+            "tinybird_host": tinybird_host,
+            "tinybird_token": tinybird_token,
+            "user_id": user_id,
+            "prompt": prompt,
+            "mission": mission,
+            "schedule": config.get("schedule") or "",
+        })
+    return runs
+
+def group_notification_runs(runs):
+    """
+    Merge runs of the same notification type against the same workspace.
+
+    Channels pointing at the same Tinybird host and token get the same report, so it is
+    computed once per (host, token fingerprint, notification type) and posted to each of them.
+    """
+    groups = {}
+    for run in runs:
+        key = (run["tinybird_host"], token_fingerprint(run["tinybird_token"]), run["notification_type"])
+        group = groups.get(key)
+        if group is None:
+            groups[key] = {**run, "channel_ids": [run["channel_id"]]}
+        elif run["channel_id"] not in group["channel_ids"]:
+            group["channel_ids"].append(run["channel_id"])
+    return list(groups.values())
+
+async def post_to_channels(channel_ids, text):
+    """Post a notification to every channel, returns the channels it could not be posted to"""
+    slack_token = os.getenv("SLACK_TOKEN", "")
+    results = await asyncio.gather(*(
+        slack_dispatcher.call("chat.postMessage", slack_token, {"channel": channel_id, "text": text})
+        for channel_id in channel_ids
+    ))
+    failed = []
+    for channel_id, result in zip(channel_ids, results):
+        if not result.get("ok"):
+            print(f"Failed to post notification to channel {channel_id}: {result.get('error')}")
+            failed.append(channel_id)
+    return failed
+
+def posted_to_channel(run_response, channel_id):
+    """Whether the agent's Slack tools posted a message to the channel during the run"""
+    for tool in getattr(run_response, "tools", None) or []:
+        if tool.tool_name not in ("send_message", "send_message_thread") or tool.tool_call_error:
+            continue
         try:
-            await run_single_command(
+            result = json.loads(tool.result or "")
+        except ValueError:
+            continue
+        # SlackTools return the chat.postMessage response, or {"error": ...}
+        if isinstance(result, dict) and result.get("ok") and result.get("channel") == channel_id:
+            return True
+    return False
+
+async def get_cpu_spikes_context(run):
+    """
+    Detect cpu spikes before running the agent.
+
+    Returns the spike windows for the agent and their findings. The context is None
+    when there are no spikes, so the run can be skipped. If the load can't be queried
+    it's empty and the agent looks for spikes itself, as before.
+    """
+    try:
+        windows = await find_cpu_spikes(run["tinybird_host"], run["tinybird_token"])
+    except Exception as e:
+        print(f"CPU spikes pre-filter failed, running the full investigation: {e}")
+        return "", None
+    if not windows:
+        return None, None
+    return describe_spikes(windows), cpu_spike_findings(windows)
+
+_birdwatcher_config = None
+
+def get_birdwatcher_config():
+    """TinybirdConfig of the birdwatcher workspace, where baselines and deliveries are kept. None without TINYBIRD_BIRDWATCHER_TOKEN"""
+    global _birdwatcher_config
+    token = os.getenv('TINYBIRD_BIRDWATCHER_TOKEN')
+    if not token:
+        return None
+    if _birdwatcher_config is None:
+        _birdwatcher_config = create_tinybird_config(token=token)
+    return _birdwatcher_config
+
+async def get_daily_summary_context(run):
+    """
+    Diff the last 24 hours of the workspace against its stored daily baselines.
+
+    Returns the notable changes for the agent and their findings, or (None, None) if
+    they can't be computed, in which case the agent extracts the metrics itself, as before.
+    """
+    config = get_birdwatcher_config()
+    if not config:
+        return None, None
+    try:
+        context, changes = await build_daily_summary_context(config, run["tinybird_host"], run["tinybird_token"])
+    except Exception as e:
+        print(f"Daily summary baselines failed, running the full investigation: {e}")
+        return None, None
+    return context, daily_summary_findings(changes)
+
+async def get_changed_channels(channel_ids, notification_type, fingerprint):
+    """Channels whose last delivered notification had other findings. All of them if the deliveries can't be read"""
+    config = get_birdwatcher_config()
+    if not config:
+        return channel_ids
+    try:
+        delivered = await config.get_last_notification_fingerprints(channel_ids, notification_type)
+    except Exception as e:
+        print(f"Failed to get the last notifications, posting to every channel: {e}")
+        return channel_ids
+    return [channel_id for channel_id in channel_ids if delivered.get(channel_id) != fingerprint]
+
+async def record_delivery(channel_ids, notification_type, fingerprint, findings):
+    config = get_birdwatcher_config()
+    if config and not await config.save_notification_delivery(channel_ids, notification_type, fingerprint, findings):
+        print(f"Failed to record the {notification_type} delivery to {', '.join(channel_ids)}, it may be posted again")
+
+async def run_notification_check(run, mcp_pool):
+    """
+    Run the agent for a single notification, shared by every channel of the run.
+
+    Returns "skipped" if there was nothing to report and "unchanged" if the findings are
+    the same as those last delivered to every channel.
+    """
+    channel_ids = run.get("channel_ids", [run["channel_id"]])
+    notification_type = run["notification_type"]
+    instructions, findings = None, None
+    precomputed = False
+    if notification_type == "cpu_spikes":
+        context, findings = await get_cpu_spikes_context(run)
+        if context is None:
+            print(f"No cpu spikes for channels {', '.join(channel_ids)}, skipping the agent run")
+            return "skipped"
+        if context:
+            instructions = [context]
+    elif notification_type == "daily_summary":
+        context, findings = await get_daily_summary_context(run)
+        if context:
+            instructions = [context]
+            precomputed = True
+
+    fingerprint = None
+    if findings is not None:
+        # Only post to channels that haven't seen these findings yet
+        fingerprint = fingerprint_findings(notification_type, findings)
+        changed = await get_changed_channels(channel_ids, notification_type, fingerprint)
+        unchanged = [channel_id for channel_id in channel_ids if channel_id not in changed]
+        if unchanged:
+            print(f"No material changes in {notification_type} for channels {', '.join(unchanged)}")
+            if NOTIFICATION_UNCHANGED_ACTION == "collapse":
+                await post_to_channels(unchanged, UNCHANGED_MESSAGES.get(notification_type, UNCHANGED_MESSAGES["default"]))
+        if not changed:
+            return "unchanged"
+        channel_ids = changed
+
+    # Runs against the same workspace reuse warm MCP sessions
+    async with mcp_pool.session(run["tinybird_host"], run["tinybird_token"]) as mcp_tools:
+        if len(channel_ids) > 1:
+            prompt, mission = get_notification_prompt(notification_type, precomputed=precomputed)
+            # The report is shared by every subscriber, keep it out of any one user's history
+            message = await run_agent(
                 prompt=prompt,
-                user_id=user_id,
+                instructions=instructions,
+                user_id="system",
                 mission=mission,
                 reasoning=True,
-            )        
-        except Exception as e:
-            print(f"Error running notification check: {str(e)}")
+                tinybird_host=run["tinybird_host"],
+                tinybird_api_key=run["tinybird_token"],
+                mcp_tools=mcp_tools,
+                source="notification",
+                channel_ids=channel_ids,
+            )
+            if not message:
+                raise Exception("The agent returned an empty report")
+            failed = await post_to_channels(channel_ids, message)
+            if fingerprint and len(failed) < len(channel_ids):
+                await record_delivery([c for c in channel_ids if c not in failed], notification_type, fingerprint, findings)
+            if failed:
+                raise Exception(f"Failed to post to {len(failed)} of {len(channel_ids)} channels: {', '.join(failed)}")
+            return
+        prompt, mission = get_notification_prompt(notification_type, channel_ids[0], precomputed=precomputed)
+        run_response = await run_single_command(
+            prompt=prompt,
+            instructions=instructions,
+            user_id=run["user_id"],
+            mission=mission,
+            reasoning=True,
+            raise_errors=True,
+            tinybird_host=run["tinybird_host"],
+            tinybird_api_key=run["tinybird_token"],
+            mcp_tools=mcp_tools,
+            source="notification",
+            channel_id=channel_ids[0],
+        )
+        # The agent posts the notification itself, only a message that got through counts as delivered
+        if not posted_to_channel(run_response, channel_ids[0]):
+            raise Exception(f"The agent did not post the notification to channel {channel_ids[0]}")
+        if fingerprint:
+            await record_delivery(channel_ids, notification_type, fingerprint, findings)
+
+class RunLimits:
+    """Concurrency limits of notification runs, overall and per Tinybird host, shared by every batch using them"""
+
+    def __init__(self, concurrency=None, per_host_concurrency=None):
+        self.concurrency = concurrency or NOTIFICATION_CONCURRENCY
+        self.per_host_concurrency = per_host_concurrency or NOTIFICATION_CONCURRENCY_PER_HOST
+        self.global_limit = asyncio.Semaphore(self.concurrency)
+        self.host_limits = {}
+
+    def host(self, tinybird_host):
+        return self.host_limits.setdefault(tinybird_host, asyncio.Semaphore(self.per_host_concurrency))
+
+def create_mcp_pool(concurrency=None):
+    return MCPSessionPool(max_sessions=max(concurrency or NOTIFICATION_CONCURRENCY, int(os.getenv("MCP_POOL_MAX_SESSIONS", 20))))
+
+async def run_notifications(runs, concurrency=None, per_host_concurrency=None, timeout=None, limits=None, mcp_pool=None):
+    """
+    Run notification checks concurrently, bounded globally and per Tinybird host.
+
+    Args:
+        runs (list): Runs built with build_notification_runs
+        concurrency (int, optional): Maximum runs at once. Defaults to NOTIFICATION_CONCURRENCY
+        per_host_concurrency (int, optional): Maximum runs at once against the same host. Defaults to NOTIFICATION_CONCURRENCY_PER_HOST
+        timeout (float, optional): Seconds before a run is cancelled. Defaults to NOTIFICATION_TIMEOUT_SECONDS
+        limits (RunLimits, optional): Limits shared with other batches, replaces concurrency and per_host_concurrency
+        mcp_pool (MCPSessionPool, optional): Pool shared with other batches, left open. By default a pool is created and closed
+
+    Returns:
+        list: One result per run with its status, duration and error
+    """
+    limits = limits or RunLimits(concurrency, per_host_concurrency)
+    timeout = timeout or NOTIFICATION_TIMEOUT_SECONDS
+    owns_pool = mcp_pool is None
+    if owns_pool:
+        mcp_pool = create_mcp_pool(limits.concurrency)
+
+    async def run_bounded(run):
+        # Take the host slot first so runs waiting on a busy host don't hold global slots
+        channels = ", ".join(run.get("channel_ids", [run["channel_id"]]))
+        async with limits.host(run["tinybird_host"]), limits.global_limit:
+            print(f"Running {run['notification_type']} for channels {channels}")
+            start = time.monotonic()
+            status, error = "ok", None
+            try:
+                status = await asyncio.wait_for(run_notification_check(run, mcp_pool), timeout) or "ok"
+            except asyncio.TimeoutError:
+                status, error = "timeout", f"timed out after {timeout:.0f}s"
+            except Exception as e:
+                status, error = "failed", str(e)
+            duration = time.monotonic() - start
+            print(f"Finished {run['notification_type']} for channels {channels}: {status} in {duration:.1f}s")
+            return {
+                "channel_id": channels,
+                "notification_type": run["notification_type"],
+                "tinybird_host": run["tinybird_host"],
+                "status": status,
+                "duration": duration,
+                "error": error,
+            }
+
+    try:
+        return await asyncio.gather(*(run_bounded(run) for run in runs))
+    finally:
+        if owns_pool:
+            await mcp_pool.close()
+
+def print_summary(results, elapsed):
+    """Print durations and failures of the notification runs"""
+    print("=" * 50)
+    print(f"{'channels':<14} {'type':<15} {'status':<10} {'duration':>9}")
+    for result in sorted(results, key=lambda r: r["duration"], reverse=True):
+        print(f"{result['channel_id']:<14} {result['notification_type']:<15} {result['status']:<10} {result['duration']:>8.1f}s")
+    failures = [r for r in results if r["status"] not in ("ok", "skipped", "unchanged")]
+    total = sum(r["duration"] for r in results)
+    skipped = sum(1 for r in results if r["status"] == "skipped")
+    unchanged = sum(1 for r in results if r["status"] == "unchanged")
+    print(f"{len(results)} runs, {skipped} skipped, {unchanged} unchanged, {len(failures)} failed, {elapsed:.1f}s elapsed ({total:.1f}s of agent time)")
+    for result in failures:
+        print(f"❌ {result['channel_id']} {result['notification_type']}: {result['error']}")
 
 async def main():
     try:
@@ -80,14 +393,24 @@ async def main():
         if not response.get('data'):
             print("No notification configurations found")
             return
-            
-        # Process each configuration
+
+        runs = []
         for config in response['data']:
             print(config)
-            await run_notification_check(config)
-            
+            runs.extend(build_notification_runs(config))
+
+        groups = group_notification_runs(runs)
+        print(f"{len(runs)} notifications, {len(groups)} agent runs after grouping by workspace")
+
+        start = time.monotonic()
+        results = await run_notifications(groups)
+        print_summary(results, time.monotonic() - start)
+
     except Exception as e:
         print(f"Error in main: {str(e)}")
+    finally:
+        await close_event_batchers()
+        await close_sessions()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
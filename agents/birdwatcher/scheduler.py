@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Long-running notification scheduler.
+
+Keeps the notification schedules of every channel in memory and runs them when due,
+instead of running check_notifications.py from an external cron. Agents, HTTP sessions
+and MCP sessions stay warm between runs.
+"""
+import os
+import sys
+import time
+import asyncio
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.cron import CronSchedule, DEFAULT_NOTIFICATION_SCHEDULE
+from api.http import close_sessions
+from api.event_batcher import close_event_batchers
+from check_notifications import (
+    RunLimits,
+    build_notification_runs,
+    create_mcp_pool,
+    get_notification_configs,
+    group_notification_runs,
+    print_summary,
+    run_notifications,
+)
+
+# Seconds between reloads of the notification configurations
+SCHEDULER_RELOAD_SECONDS = float(os.getenv("SCHEDULER_RELOAD_SECONDS", 300))
+# Longest sleep between checks for due jobs, so clock jumps are noticed
+SCHEDULER_MAX_SLEEP_SECONDS = 60
+
+
+class NotificationScheduler:
+    """
+    Runs the notifications of each channel on its own cron schedule.
+
+    Configurations are reloaded every `reload_interval` seconds and only channels whose
+    configuration changed are rebuilt, the rest keep their jobs and next run time. Due
+    jobs of the same minute are grouped by workspace like check_notifications.py does,
+    and run on the scheduler's event loop with limits and an MCP pool shared by every batch.
+    A job still running when it's due again is not started twice.
+    """
+
+    def __init__(self, reload_interval=None, default_schedule=None, limits=None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            reload_interval (float, optional): Seconds between config reloads. Defaults to SCHEDULER_RELOAD_SECONDS
+            default_schedule (str, optional): Cron expression of channels without one. Defaults to NOTIFICATION_SCHEDULE
+            limits (RunLimits, optional): Concurrency limits of the agent runs
+        """
+        self.reload_interval = reload_interval or SCHEDULER_RELOAD_SECONDS
+        self.default_schedule = CronSchedule(default_schedule or DEFAULT_NOTIFICATION_SCHEDULE)
+        self.limits = limits or RunLimits()
+        self.mcp_pool = create_mcp_pool(self.limits.concurrency)
+        # (channel_id, notification_type) -> {"run", "schedule", "next_run"}
+        self.jobs = {}
+        self._signatures = {}
+        self._running = set()
+        self._tasks = set()
+        self._last_reload = None
+        self._stopped = asyncio.Event()
+
+    def _parse_schedule(self, config):
+        expression = (config.get("schedule") or "").strip()
+        if not expression:
+            return self.default_schedule
+        try:
+            schedule = CronSchedule(expression)
+            schedule.next_after(datetime.utcnow())
+            return schedule
+        except ValueError as e:
+            print(f"{e} for channel {config.get('channel_id')}, using {self.default_schedule.expression}")
+            return self.default_schedule
+
+    def load_configs(self, configs, now=None):
+        """
+        Update the jobs from the latest configurations.
+
+        Args:
+            configs (list): Rows of get_latest_user_token
+            now (datetime, optional): Current UTC time
+
+        Returns:
+            tuple: Number of channels added, updated and removed
+        """
+        now = now or datetime.utcnow()
+        added = updated = 0
+        seen = set()
+        for config in configs:
+            channel_id = config.get("channel_id")
+            if not channel_id:
+                continue
+            seen.add(channel_id)
+            signature = (
+                config.get("token"),
+                config.get("host"),
+                tuple(config.get("notification_types") or []),
+                config.get("schedule") or "",
+                config.get("user_id"),
+            )
+            if self._signatures.get(channel_id) == signature:
+                continue
+            if channel_id in self._signatures:
+                updated += 1
+            else:
+                added += 1
+            self._signatures[channel_id] = signature
+
+            schedule = self._parse_schedule(config)
+            previous = {key: job for key, job in self.jobs.items() if key[0] == channel_id}
+            for key in previous:
+                del self.jobs[key]
+            for run in build_notification_runs(config):
+                key = (channel_id, run["notification_type"])
+                old = previous.get(key)
+                # Keep the next run time unless the schedule changed
+                if old and old["schedule"].expression == schedule.expression:
+                    next_run = old["next_run"]
+                else:
+                    next_run = schedule.next_after(now)
+                self.jobs[key] = {"run": run, "schedule": schedule, "next_run": next_run}
+
+        removed = [channel_id for channel_id in self._signatures if channel_id not in seen]
+        for channel_id in removed:
+            del self._signatures[channel_id]
+        self.jobs = {key: job for key, job in self.jobs.items() if key[0] not in removed}
+        return added, updated, len(removed)
+
+    async def reload(self):
+        """Fetch the configurations and update the jobs, keeping the current ones if they can't be fetched"""
+        self._last_reload = time.monotonic()
+        try:
+            response = await get_notification_configs()
+        except Exception as e:
+            print(f"Failed to reload notification configurations, keeping {len(self.jobs)} jobs: {e}")
+            return
+        added, updated, removed = self.load_configs(response.get("data") or [])
+        if added or updated or removed:
+            print(f"Notification configurations reloaded: {added} added, {updated} updated, {removed} removed, {len(self.jobs)} jobs")
+
+    def due_jobs(self, now):
+        """Get the jobs due at `now` and schedule their next run"""
+        due = []
+        for key, job in self.jobs.items():
+            if job["next_run"] > now:
+                continue
+            job["next_run"] = job["schedule"].next_after(now)
+            if key in self._running:
+                print(f"Skipping {key[1]} for channel {key[0]}, the previous run is still going")
+                continue
+            due.append(key)
+        return due
+
+    def run_due(self, now=None):
+        """Start the due jobs in the background"""
+        due = self.due_jobs(now or datetime.utcnow())
+        if not due:
+            return None
+        self._running.update(due)
+        task = asyncio.create_task(self._run_batch(due))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run_batch(self, keys):
+        try:
+            groups = group_notification_runs([self.jobs[key]["run"] for key in keys if key in self.jobs])
+            print(f"{len(keys)} notifications due, {len(groups)} agent runs after grouping by workspace")
+            start = time.monotonic()
+            results = await run_notifications(groups, limits=self.limits, mcp_pool=self.mcp_pool)
+            print_summary(results, time.monotonic() - start)
+        except Exception as e:
+            print(f"Error running notifications: {e}")
+        finally:
+            self._running.difference_update(keys)
+
+    def _seconds_to_next_event(self):
+        now = datetime.utcnow()
+        seconds = SCHEDULER_MAX_SLEEP_SECONDS
+        if self.jobs:
+            next_run = min(job["next_run"] for job in self.jobs.values())
+            seconds = min(seconds, (next_run - now).total_seconds())
+        seconds = min(seconds, self._last_reload + self.reload_interval - time.monotonic())
+        return max(seconds, 0)
+
+    async def run(self):
+        """Reload configurations and run due jobs until stopped"""
+        print(f"🗓️ Notification scheduler started, default schedule {self.default_schedule.expression}")
+        # Evict idle MCP sessions between runs, closed by `stop`
+        await self.mcp_pool.start()
+        while not self._stopped.is_set():
+            if self._last_reload is None or time.monotonic() - self._last_reload >= self.reload_interval:
+                await self.reload()
+            self.run_due()
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self._seconds_to_next_event())
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self, timeout=None):
+        """Stop scheduling, wait up to `timeout` seconds for running jobs and close the MCP pool"""
+        self._stopped.set()
+        if self._tasks:
+            done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self.mcp_pool.close()
+
+
+async def main():
+    scheduler = NotificationScheduler()
+    try:
+        await scheduler.run()
+    finally:
+        await scheduler.stop(timeout=30)
+        await close_event_batchers()
+        await close_sessions()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nScheduler stopped")
@@ -4,6 +4,7 @@ Server script for running the Agno Slack bot
 """
 import os
 import sys
+import asyncio
 from aiohttp import web
 
 # Add current directory to Python path
@@ -11,6 +12,24 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from api.slack import app
 
+
+async def start_scheduler(app):
+    from scheduler import NotificationScheduler
+
+    app["scheduler"] = NotificationScheduler()
+    app["scheduler_task"] = asyncio.create_task(app["scheduler"].run())
+
+
+async def stop_scheduler(app):
+    await app["scheduler"].stop(timeout=30)
+    await app["scheduler_task"]
+
+
+# Run the notification scheduler in the bot process instead of check_notifications.py from a cron
+if os.environ.get("NOTIFICATION_SCHEDULER", "false").lower() == "true":
+    app.on_startup.append(start_scheduler)
+    app.on_cleanup.insert(0, stop_scheduler)
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     print(f"🚀 Starting Agno Slack bot server on port {port}")